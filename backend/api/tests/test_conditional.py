@@ -0,0 +1,53 @@
+import datetime
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from services.diagnostics import clear_caches, read_endpoints
+from services.models import Service
+from services.seed import seed_dataset
+
+MAIN_PAGE = "/api/v1/services/"
+TARIFFS = "/api/v1/tariffs/"
+
+
+@pytest.fixture
+def user(db):
+    seed_dataset(users=3, services=3, cashbacks=0, seed=0)
+    clear_caches()
+    user, _ = read_endpoints()
+    return user
+
+
+def test_other_process_changes_etag(user, api_client, manage):
+    api_client.force_authenticate(user)
+    etag = api_client.get(MAIN_PAGE)["ETag"]
+    response = api_client.get(MAIN_PAGE, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    # кешбэк начисляет периодическая команда в другом процессе
+    manage("accrue_cashbacks")
+
+    response = api_client.get(MAIN_PAGE, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.parametrize("url", (MAIN_PAGE, TARIFFS))
+def test_publication_changes_etag(user, api_client, url):
+    api_client.force_authenticate(user)
+    now = timezone.now()
+    service = Service.objects.first()
+    service.pub_date = now + datetime.timedelta(hours=1)
+    service.save()
+    response = api_client.get(url)
+    assert len(response.data) == 2
+
+    later = now + datetime.timedelta(hours=2)
+    with mock.patch("django.utils.timezone.now", return_value=later):
+        response = api_client.get(
+            url, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+    assert response.status_code == 200
+    assert len(response.data) == 3
@@ -0,0 +1,66 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from api.v1.idempotency import idempotent
+from services.diagnostics import clear_caches
+from users.models import CustomUser
+
+KEY = {"HTTP_IDEMPOTENCY_KEY": "payment-1"}
+
+
+class CountingView(APIView):
+    calls = 0
+
+    @idempotent
+    def post(self, request):
+        CountingView.calls += 1
+        return Response({"call": CountingView.calls})
+
+
+def post(user):
+    request = APIRequestFactory().post("/pay/", {"amount": 1}, **KEY)
+    force_authenticate(request, user)
+    return CountingView.as_view()(request)
+
+
+@pytest.fixture(autouse=True)
+def calls(db):
+    clear_caches()
+    CountingView.calls = 0
+
+
+def test_anonymous_requests_are_not_replayed():
+    post(AnonymousUser())
+    response = post(AnonymousUser())
+    assert response.data == {"call": 2}
+    assert not response.has_header("Idempotent-Replayed")
+
+
+def test_user_request_is_replayed(db):
+    user = CustomUser.objects.create(username="payer", email="p@example.com")
+    post(user)
+    response = post(user)
+    assert response.data == {"call": 1}
+    assert response["Idempotent-Replayed"] == "true"
+
+
+def test_payment_requires_authentication(api_client):
+    response = api_client.post("/api/v1/subscription_payment/", **KEY)
+    assert response.status_code == 401
+
+
+def test_key_taken_after_expiry_conflicts(db, settings):
+    user = CustomUser.objects.create(username="payer", email="p@example.com")
+    cache = caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+    # ответ истек, а ключ тут же занял параллельный запрос
+    with mock.patch.object(cache, "add", return_value=False), \
+            mock.patch.object(cache, "get", return_value=None):
+        response = post(user)
+    assert response.status_code == 409
+    assert CountingView.calls == 0
@@ -0,0 +1,27 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from api.v1.replicas import ReplicaStickinessMiddleware
+
+
+def test_asgi_chain_stays_async():
+    handler = ASGIHandler()
+    assert asyncio.iscoroutinefunction(handler._middleware_chain)
+
+
+def test_async_write_marks_user_sticky():
+    async def get_response(request):
+        return HttpResponse(status=201)
+
+    middleware = ReplicaStickinessMiddleware(get_response)
+    request = RequestFactory().post("/")
+    request.user = mock.Mock(pk=7, is_authenticated=True)
+    with mock.patch("api.v1.replicas.mark_sticky") as mark_sticky:
+        response = async_to_sync(middleware)(request)
+    assert response.status_code == 201
+    mark_sticky.assert_called_once_with(7)
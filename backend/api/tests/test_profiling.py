@@ -0,0 +1,48 @@
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from api.v1.async_views import async_view
+from api.v1.profiling import (ProfilingMiddleware, RequestProfile,
+                              _current_profile)
+
+
+def query_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return HttpResponse()
+
+
+def test_async_view_queries_profiled(transactional_db):
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    try:
+        async_to_sync(async_view(query_view))(RequestFactory().get("/"))
+    finally:
+        _current_profile.reset(token)
+    assert profile.sql_count == 1
+
+
+def test_async_chain_profiles_sync_view(transactional_db, settings):
+    settings.PROFILING_SAMPLE_RATE = 1.0
+    # так Django вызывает синхронное представление в async-цепочке
+    view = sync_to_async(query_view, thread_sensitive=True)
+
+    async def get_response(request):
+        return await view(request)
+
+    middleware = ProfilingMiddleware(get_response)
+    assert asyncio.iscoroutinefunction(middleware)
+    response = async_to_sync(middleware)(RequestFactory().get("/"))
+    assert 'desc="1 queries"' in response["Server-Timing"]
+
+
+def test_asgi_chain_with_profiling_stays_async(settings):
+    settings.MIDDLEWARE = [
+        *settings.MIDDLEWARE, "api.v1.profiling.ProfilingMiddleware"
+    ]
+    assert asyncio.iscoroutinefunction(ASGIHandler()._middleware_chain)
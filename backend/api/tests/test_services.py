@@ -0,0 +1,66 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.v1.serializers import RatingSerializer
+from services.diagnostics import clear_caches, read_endpoints
+from services.models import Rating, Service
+from services.seed import seed_dataset
+
+User = get_user_model()
+
+MAIN_PAGE = "/api/v1/services/"
+
+
+@pytest.mark.django_db
+def test_main_page_query_count_does_not_depend_on_services(
+    api_client, django_assert_num_queries
+):
+    seed_dataset(users=3, services=3, seed=0)
+    user, _ = read_endpoints()
+    api_client.force_authenticate(user)
+    clear_caches()
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(MAIN_PAGE)
+    assert response.status_code == 200
+    assert len(response.data) == 3
+
+    seed_dataset(users=3, services=12, seed=1)
+    clear_caches()
+    with django_assert_num_queries(len(queries)):
+        response = api_client.get(MAIN_PAGE)
+    assert response.status_code == 200
+    assert len(response.data) == 15
+
+
+@pytest.mark.django_db
+def test_rating_response_has_fresh_average():
+    seed_dataset(users=2, services=1, ratings=0, payments=0, seed=0)
+    service = Service.objects.get()
+    first, second = User.objects.order_by("pk")
+    Rating.objects.create(user=first, service=service, stars=2)
+
+    serializer = RatingSerializer(
+        data={"user": second.pk, "service": service.pk, "stars": 5}
+    )
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    assert serializer.data["average_ratings"] == 3.5
+
+
+@pytest.mark.django_db
+def test_versions_read_once_per_request(api_client):
+    seed_dataset(users=3, services=3, seed=0)
+    user, endpoints = read_endpoints()
+    api_client.force_authenticate(user)
+    clear_caches()
+    for _, url in endpoints:
+        api_client.get(url)
+    for name, url in endpoints:
+        with CaptureQueriesContext(connection) as queries:
+            assert api_client.get(url).status_code == 200
+        cache_reads = [
+            query for query in queries if "pay2u_cache" in query["sql"]
+        ]
+        assert len(cache_reads) == 1, name
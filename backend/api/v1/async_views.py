@@ -0,0 +1,68 @@
+"""Асинхронные представления каталога для режима ASGI.
+
+Синхронные представления под ASGI Django выполняет в одном общем
+потоке, поэтому медленный запрос к БД задерживает все остальные.
+Здесь представления чтения каталога вызываются из async-представлений
+в отдельном пуле ORM_THREAD_POOL_SIZE потоков: цикл событий не
+блокируется, а запросы к БД идут параллельно, каждый поток со своим
+соединением.
+"""
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .profiling import profile_queries
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def orm_executor():
+    """Пул потоков для работы с ORM, создается при первом запросе."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ORM_THREAD_POOL_SIZE,
+                thread_name_prefix="orm",
+            )
+    return _executor
+
+
+def _call_view(view, request, *args, **kwargs):
+    """Выполняет представление и отрисовку ответа в потоке пула.
+
+    Соединения потока закрываются по правилам CONN_MAX_AGE, как это
+    делают сигналы начала и конца запроса в обычном режиме. Запросы
+    к базе этого потока попадают в замер ProfilingMiddleware.
+    """
+    close_old_connections()
+    try:
+        profile_queries()
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, "render", None)):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Async-обертка синхронного представления для режима ASGI.
+
+    Атрибуты представления DRF (cls, actions) сохраняются, так что
+    схема API строится по-прежнему.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        call_view = sync_to_async(
+            _call_view, thread_sensitive=False, executor=orm_executor()
+        )
+        return await call_view(view, request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,153 @@
+"""HTTP-кэширование эндпоинтов на чтение."""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from services.cache import cache_stats, get_version_values, get_versions
+from services.catalog import last_publication
+
+RESPONSE_CACHE_KEY = "response:{view}:{action}:{digest}:{versions}"
+
+
+def publication_stamp():
+    """Последняя наступившая дата публикации сервисов в секундах."""
+    published = last_publication()
+    return int(published.timestamp()) if published is not None else 0
+
+
+class CachedResponseMixin:
+    """Кэширует ответы list/retrieve, не зависящие от пользователя.
+
+    Ключ содержит версии моделей из cache_models, поэтому сохранение
+    или удаление любой из них делает закэшированные ответы устаревшими.
+    С cache_publication в ключ входит и последняя наступившая дата
+    публикации сервисов: так устаревают ответы, отбирающие сервисы
+    по pub_date, когда наступает дата публикации очередного сервиса.
+    """
+
+    cache_models = ()
+    cache_actions = ("list", "retrieve")
+    cache_publication = False
+
+    def get_cache_key(self, request):
+        digest = hashlib.md5(
+            "|".join(
+                (
+                    request.scheme,
+                    request.get_host(),
+                    repr(sorted(self.kwargs.items())),
+                    request.META.get("QUERY_STRING", ""),
+                )
+            ).encode()
+        ).hexdigest()
+        versions = get_versions(*self.cache_models)
+        if self.cache_publication:
+            versions += f".{publication_stamp()}"
+        return RESPONSE_CACHE_KEY.format(
+            view=type(self).__name__,
+            action=self.action,
+            digest=digest,
+            versions=versions,
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cache_actions:
+            return handler(request, *args, **kwargs)
+        cache = caches[settings.API_CACHE_ALIAS]
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            cache_stats.hit("response")
+            return Response(data)
+        cache_stats.miss("response")
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на условные GET-запросы list/retrieve.
+
+    ETag и Last-Modified вычисляются без сериализации: из версий моделей,
+    от которых зависит ответ (см. services.cache), и параметров запроса.
+    Для ответов, зависящих от пользователя, в ETag входит его id,
+    с conditional_publication - последняя наступившая дата публикации
+    сервисов, как у CachedResponseMixin.
+    """
+
+    conditional_models = ()
+    conditional_actions = ("list", "retrieve")
+    conditional_per_user = False
+    conditional_publication = False
+
+    def get_conditional_models(self):
+        return self.conditional_models
+
+    def get_validators(self, request):
+        versions = get_version_values(*self.get_conditional_models())
+        parts = [
+            type(self).__name__,
+            self.action,
+            request.scheme,
+            request.get_host(),
+            request.accepted_renderer.format,
+            repr(sorted(self.kwargs.items())),
+            request.META.get("QUERY_STRING", ""),
+        ]
+        if self.conditional_per_user:
+            parts.append(str(request.user.pk))
+        parts.extend(str(version) for version in versions)
+        last_modified = max(versions) // 10 ** 9 if versions else None
+        if self.conditional_publication:
+            published = publication_stamp()
+            parts.append(str(published))
+            last_modified = max(last_modified or 0, published)
+        etag = '"%s"' % hashlib.md5("|".join(parts).encode()).hexdigest()
+        return etag, last_modified
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if (
+            self.action not in self.conditional_actions
+            or request.method not in ("GET", "HEAD")
+        ):
+            return handler(request, *args, **kwargs)
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            if self.conditional_per_user:
+                patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,98 @@
+"""Данные главной страницы, общие для всех сервисов в выдаче."""
+from django.utils.functional import cached_property
+
+from payments.models import Payment, SpendingLedger
+from services.catalog import get_category_catalog
+from services.images import rendition_url
+from services.models import Service
+from .serializers import CategorySerializer, ServiceShortSerializer
+
+
+class MainPageDashboard:
+    """Пользовательские данные главной страницы.
+
+    Сериализатор главной страницы вызывается для каждого сервиса в выдаче,
+    а большая часть его полей зависит только от пользователя. Поэтому всё
+    вычисляется здесь один раз на запрос фиксированным числом запросов к БД,
+    независимо от количества сервисов.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+
+    @cached_property
+    def images(self):
+        """Изображения сервисов, на которые подписан пользователь."""
+        if not self.is_authenticated:
+            return []
+        subscriptions = self.user.subscriptions.select_related("service")
+        return [
+            rendition_url(subscription.service.image, "small")
+            for subscription in subscriptions
+        ]
+
+    @cached_property
+    def nearest_payments(self):
+        """Ближайший по дате платеж пользователя для каждого сервиса."""
+        if not self.is_authenticated:
+            return {}
+        payments = (
+            Payment.objects.filter(user=self.user)
+            .select_related("tariff_kind")
+            .order_by("service_id", "next_payment_date")
+        )
+        nearest = {}
+        for payment in payments:
+            nearest.setdefault(payment.service_id, payment)
+        return nearest
+
+    @cached_property
+    def ledger(self):
+        """Сводка расходов пользователя, один запрос по первичному ключу."""
+        if not self.is_authenticated:
+            return None
+        return SpendingLedger.objects.filter(pk=self.user.pk).first()
+
+    @property
+    def accumulated(self):
+        """Накопленный пользователем кэшбек."""
+        if self.ledger is None:
+            return 0
+        return self.ledger.total_cashback
+
+    @property
+    def total_spent(self):
+        """Сумма потраченных пользователем средств."""
+        if self.ledger is None:
+            return 0
+        return self.ledger.total_spent
+
+    @cached_property
+    def new_services(self):
+        return self._short_list(Service.objects.filter(new=True))
+
+    @cached_property
+    def old_services(self):
+        return self._short_list(Service.objects.filter(new=False))
+
+    @cached_property
+    def popular_services(self):
+        return self._short_list(Service.objects.filter(popular=True))
+
+    @cached_property
+    def high_rated_services(self):
+        return self._short_list(Service.objects.filter(rating__stars__gt=4))
+
+    @cached_property
+    def low_rated_services(self):
+        return self._short_list(Service.objects.filter(rating__stars__lte=4))
+
+    @cached_property
+    def categories(self):
+        """Категории каталога с максимальным кэшбеком."""
+        return CategorySerializer(get_category_catalog(), many=True).data
+
+    @staticmethod
+    def _short_list(queryset):
+        return ServiceShortSerializer(queryset, many=True).data
@@ -0,0 +1,47 @@
+from drf_extra_fields.fields import Base64ImageField
+
+from services.images import get_base64_payload, rendition_url
+
+IMAGE_FORMAT_PARAM = "image_format"
+IMAGE_FORMAT_BASE64 = "base64"
+
+
+class CachedBase64ImageField(Base64ImageField):
+    """Изображение ссылкой, а по запросу ?image_format=base64 - содержимым.
+
+    При заданном rendition ссылка и содержимое берутся из уменьшенной
+    копии нужного размера (см. services.images.RENDITION_SIZES).
+    Содержимое берется из кэша закодированных изображений
+    и запоминается на время сериализации ответа, поэтому одно и то же
+    изображение в разных строках выдачи кодируется один раз.
+    """
+
+    def __init__(self, *args, rendition=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rendition = rendition
+        self._payloads = {}
+
+    def inline_requested(self):
+        request = self.context.get("request")
+        return (
+            request is not None
+            and request.query_params.get(IMAGE_FORMAT_PARAM)
+            == IMAGE_FORMAT_BASE64
+        )
+
+    def to_representation(self, file):
+        if not self.inline_requested():
+            if not file or self.rendition is None:
+                return super().to_representation(file)
+            url = rendition_url(file, self.rendition)
+            request = self.context.get("request")
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+        if not file:
+            return ""
+        if file.name not in self._payloads:
+            self._payloads[file.name] = get_base64_payload(
+                file, self.rendition
+            )
+        return self._payloads[file.name]
@@ -0,0 +1,137 @@
+"""Ключи идемпотентности для POST-запросов.
+
+Клиент передает заголовок Idempotency-Key. Первый запрос с ключом
+выполняется, его ответ сохраняется в кэше на IDEMPOTENCY_KEY_TTL
+секунд, а повторы с тем же ключом получают сохраненный ответ без
+повторного выполнения представления.
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from services.cache import cache_stats
+
+IDEMPOTENCY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+IDEMPOTENCY_CACHE_KEY = "idempotency:{user}:{path}:{key}"
+MAX_KEY_LENGTH = 255
+# Ключ запроса, который еще выполняется.
+IN_PROGRESS = "in_progress"
+# Заголовки, которые повтор получает вместе с сохраненным ответом.
+REPLAYED_HEADERS = ("Location",)
+
+
+def _request_digest(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.md5(body.encode()).hexdigest()
+
+
+def _stored_response(response, digest):
+    stored = {
+        "digest": digest,
+        "status": response.status_code,
+        "headers": {
+            name: response[name]
+            for name in REPLAYED_HEADERS
+            if response.has_header(name)
+        },
+    }
+    if isinstance(response, Response):
+        stored["data"] = response.data
+    else:
+        stored["content"] = response.content
+        stored["content_type"] = response["Content-Type"]
+    return stored
+
+
+def _replay(stored):
+    if "data" in stored:
+        response = Response(stored["data"], status=stored["status"])
+    else:
+        response = HttpResponse(
+            stored["content"],
+            status=stored["status"],
+            content_type=stored["content_type"],
+        )
+    for name, value in stored["headers"].items():
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(handler):
+    """Декоратор метода представления, учитывающий Idempotency-Key.
+
+    Без заголовка запрос выполняется как обычно. Ключ действует
+    в пределах пользователя и адреса, поэтому у анонимных запросов,
+    которые делили бы одно пространство ключей, он не учитывается.
+    Повтор с тем же ключом, но другим телом получает 422, повтор во
+    время выполнения первого запроса - 409. Ответы с ошибкой сервера
+    и исключения не сохраняются, чтобы запрос можно было повторить.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.META.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response(
+                {"message": "Слишком длинный Idempotency-Key"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        cache = caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+        key = IDEMPOTENCY_CACHE_KEY.format(
+            user=request.user.pk,
+            path=request.path,
+            key=hashlib.md5(idempotency_key.encode()).hexdigest(),
+        )
+        digest = _request_digest(request)
+        if not cache.add(key, IN_PROGRESS, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            stored = cache.get(key)
+            if stored == IN_PROGRESS:
+                cache_stats.hit("idempotency")
+                return Response(
+                    {"message": "Запрос с этим ключом еще выполняется"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if stored is not None:
+                cache_stats.hit("idempotency")
+                if stored["digest"] != digest:
+                    return Response(
+                        {"message": "Ключ уже использован с другим запросом"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return _replay(stored)
+            # сохраненный ответ истек между add и get, и ключ мог
+            # успеть занять параллельный запрос
+            if not cache.add(
+                key, IN_PROGRESS, settings.IDEMPOTENCY_LOCK_TIMEOUT
+            ):
+                cache_stats.hit("idempotency")
+                return Response(
+                    {"message": "Запрос с этим ключом еще выполняется"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+        cache_stats.miss("idempotency")
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(key)
+        else:
+            cache.set(
+                key,
+                _stored_response(response, digest),
+                settings.IDEMPOTENCY_KEY_TTL,
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,24 @@
+"""Представления необязательных подсистем с отложенной загрузкой.
+
+Класс представления импортируется при первом запросе к нему, поэтому
+тяжелые зависимости вроде генератора схемы API не замедляют старт
+воркера и первый запрос к остальным эндпоинтам.
+"""
+import functools
+
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """Представление класса dotted_path, загружаемого при первом вызове."""
+
+    @functools.lru_cache(maxsize=None)
+    def resolve():
+        return import_string(dotted_path).as_view(**initkwargs)
+
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        return resolve()(request, *args, **kwargs)
+
+    return view
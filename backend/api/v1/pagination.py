@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class SellHistoryPagination(CursorPagination):
+    """Постраничная выдача истории платежей по курсору.
+
+    Страница выбирается по дате платежа через индекс (user, -payment_date),
+    поэтому время ответа не зависит от глубины прокрутки.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "-payment_date"
@@ -0,0 +1,244 @@
+"""Профилирование запросов: заголовок Server-Timing и сводка по маршрутам.
+
+Middleware подключается только при PROFILING_ENABLED и замеряет лишь
+долю запросов PROFILING_SAMPLE_RATE, остальные проходят без замеров.
+"""
+import contextvars
+import random
+import statistics
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+_current_profile = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Замеры одного запроса, время в секундах."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка execute_wrapper, считающая SQL-запросы и их время."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+    def timings(self):
+        """Длительности этапов запроса в миллисекундах."""
+        finished = self.finished or time.perf_counter()
+        view_time = render_time = 0.0
+        if self.view_started is not None:
+            view_finished = self.view_finished or finished
+            view_time = view_finished - self.view_started
+            render_time = finished - view_finished
+        return {
+            "sql": self.sql_time * 1000,
+            "serializer": self.serializer_time * 1000,
+            "view": view_time * 1000,
+            "render": render_time * 1000,
+            "total": (finished - self.started) * 1000,
+        }
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        timings = self.timings()
+        metrics = []
+        for name, duration in timings.items():
+            metric = f"{name};dur={duration:.2f}"
+            if name == "sql":
+                metric += f';desc="{self.sql_count} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+def _profiled_data(data):
+    """Свойство data сериализатора с замером времени.
+
+    Вложенные сериализаторы, которые вызывают data внутри внешнего,
+    в общее время не добавляются повторно.
+    """
+
+    def wrapper(self):
+        profile = _current_profile.get()
+        if profile is None or profile.serializer_depth:
+            return data.fget(self)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            profile.serializer_depth -= 1
+            profile.serializer_time += time.perf_counter() - started
+
+    wrapper.profiled = True
+    return property(wrapper)
+
+
+def install_serializer_timing():
+    """Добавляет замер времени в Serializer.data и ListSerializer.data."""
+    for serializer_class in (
+        serializers.Serializer,
+        serializers.ListSerializer,
+    ):
+        data = serializer_class.__dict__["data"]
+        if not getattr(data.fget, "profiled", False):
+            serializer_class.data = _profiled_data(data)
+
+
+class RouteStats:
+    """Скользящая сводка замеров по маршрутам в рамках процесса."""
+
+    def __init__(self, window):
+        self._lock = threading.Lock()
+        self._window = window
+        self._routes = {}
+
+    def add(self, route, profile):
+        timings = profile.timings()
+        timings["queries"] = profile.sql_count
+        with self._lock:
+            samples = self._routes.setdefault(
+                route, deque(maxlen=self._window)
+            )
+            samples.append(timings)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {
+                route: list(samples)
+                for route, samples in self._routes.items()
+            }
+        summary = {}
+        for route, samples in routes.items():
+            totals = sorted(sample["total"] for sample in samples)
+            summary[route] = {
+                "count": len(samples),
+                "total_p50_ms": round(statistics.median(totals), 2),
+                "total_p95_ms": round(
+                    totals[max(0, round(0.95 * len(totals)) - 1)], 2
+                ),
+            }
+            for name in ("sql", "serializer", "view", "render"):
+                summary[route][f"{name}_avg_ms"] = round(
+                    statistics.mean(sample[name] for sample in samples), 2
+                )
+            summary[route]["queries_avg"] = round(
+                statistics.mean(sample["queries"] for sample in samples), 2
+            )
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats(settings.PROFILING_WINDOW)
+
+
+def _profile_execute(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def profile_queries():
+    """Считает SQL-запросы текущего потока в замер текущего запроса.
+
+    Соединения с базой у каждого потока свои, поэтому обертку ставят
+    там, где выполняется представление: middleware - в своем потоке или,
+    под ASGI, в потоке синхронных представлений, async-представления -
+    в потоке пула ORM. Обертка остается на соединениях потока и берет
+    замер запроса из контекста, поэтому параллельные запросы в одном
+    потоке считаются каждый в свой замер.
+    """
+    if _current_profile.get() is None:
+        return
+    for connection in connections.all():
+        if _profile_execute not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_profile_execute)
+
+
+class ProfilingMiddleware:
+    """Замеряет SQL, сериализацию, представление и запрос целиком.
+
+    Должен стоять последним в MIDDLEWARE, чтобы время представления
+    не включало остальные middleware. Работает и в синхронной, и в
+    асинхронной цепочке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        install_serializer_timing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            profile_queries()
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            # синхронные представления Django выполняет в одном потоке
+            await sync_to_async(profile_queries, thread_sensitive=True)()
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        profile.finished = time.perf_counter()
+        response["Server-Timing"] = profile.server_timing()
+        match = request.resolver_match
+        if match is not None:
+            route_stats.add(
+                f"{request.method} {match.view_name or match.route}", profile
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.view_finished = time.perf_counter()
+        return response
@@ -0,0 +1,77 @@
+"""Чтение представлений API из реплик базы данных.
+
+Безопасные запросы представлений с ReplicaReadMixin читают из
+реплики, выбранной после аутентификации, а ReplicaStickinessMiddleware
+после успешного изменяющего запроса на время оставляет чтения
+пользователя в основной базе (см. services.db.routing).
+"""
+import contextlib
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from rest_framework.permissions import SAFE_METHODS
+
+from services.db.routing import choose_replica, mark_sticky, read_from
+
+
+class ReplicaReadMixin:
+    """Чтения безопасных запросов представления идут в реплику.
+
+    Реплика выбирается после аутентификации, чтобы учесть недавние
+    изменения пользователя; аутентификация читает из основной базы.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with contextlib.ExitStack() as self._replica_reads:
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self._replica_reads.enter_context(
+                read_from(choose_replica(request.user.pk))
+            )
+
+
+class ReplicaStickinessMiddleware:
+    """Отмечает пользователя после успешного изменяющего запроса.
+
+    Пользователя, аутентифицированного DRF внутри представления,
+    middleware видит в request.user уже после ответа. Middleware
+    работает и в синхронной, и в асинхронной цепочке: синхронное
+    звено под ASGI заставило бы Django выполнять все запросы воркера
+    в одном потоке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.changed(request, response):
+            self.mark(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.changed(request, response):
+            # кэш отметок может быть в базе
+            await sync_to_async(self.mark)(request)
+        return response
+
+    def changed(self, request, response):
+        return (
+            request.method not in SAFE_METHODS and response.status_code < 400
+        )
+
+    def mark(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            mark_sticky(user.pk)
@@ -1,19 +1,18 @@
 """Сериализатор для приложений services, payments и users. """
 import datetime
-import random
-import string
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Max
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import response, serializers, status
 from rest_framework.authtoken.models import Token
 from rest_framework.serializers import SerializerMethodField
 
-from payments.models import Cashback, Payment
-from services.models import Category, Rating, Service, Subscription
+from payments.models import Payment, TariffKind
+from services.models import (RATING_COUNTER_FIELDS, Category, Rating, Service,
+                             Subscription)
+from .fields import CachedBase64ImageField
 
 User = get_user_model()
 
@@ -67,8 +66,9 @@ class TokenSerializer(serializers.ModelSerializer):
 class CategorySerializer(serializers.ModelSerializer):
     """Сериализатор категории для главной страницы."""
 
-    image = Base64ImageField()
-    max_cashback = serializers.SerializerMethodField()
+    image = CachedBase64ImageField(rendition="small", read_only=True)
+    max_cashback = serializers.ReadOnlyField()
+    services_count = serializers.ReadOnlyField()
 
     class Meta:
         model = Category
@@ -77,20 +77,16 @@ class CategorySerializer(serializers.ModelSerializer):
             "image",
             "title",
             "max_cashback",
+            "services_count",
         )
         read_only_fields = (
             "id",
             "image",
             "title",
             "max_cashback",
+            "services_count",
         )
 
-    def get_max_cashback(self, obj):
-        max_cashback = obj.services.aggregate(
-            max_cashback=Max('cashback_percentage')
-        )["max_cashback"]
-        return max_cashback
-
 
 class ShortHistorySerializer(serializers.ModelSerializer):
     """Сериализатор истории покупок, для главного меню."""
@@ -101,20 +97,12 @@ class ShortHistorySerializer(serializers.ModelSerializer):
     def get_accumulated(self, obj):
         """Получение накопленного кэшбека для главной страницы."""
 
-        user = self.context.get("request").user
-        cashbacks = Cashback.objects.filter(payment__user=user)
-        accumulated = sum([cashback.amount for cashback in cashbacks])
-        return accumulated
+        return self.context["dashboard"].accumulated
 
     def get_total_spent(self, obj):
         """Получение суммы потраченных средств для главной страницы."""
 
-        user = self.context.get("request").user
-        payments = Payment.objects.filter(user=user)
-        total_spent = sum(
-            [payment.tariff_kind.cost_total for payment in payments]
-        )
-        return total_spent
+        return self.context["dashboard"].total_spent
 
     class Meta:
         model = Payment
@@ -125,6 +113,8 @@ class ShortHistorySerializer(serializers.ModelSerializer):
 
 
 class ServiceShortSerializer(serializers.ModelSerializer):
+    image = CachedBase64ImageField(rendition="small", read_only=True)
+
     class Meta:
         model = Service
         fields = (
@@ -159,103 +149,106 @@ class ServiceMainPageSerializer(serializers.ModelSerializer):
         )
 
     def get_average_ratings(self, obj):
-        ratings = Rating.objects.filter(service=obj)
-        total_ratings = sum([rating.stars for rating in ratings])
-        if ratings:
-            return total_ratings / len(ratings)
-        return 0
+        return obj.average_rating
 
     def get_image(self, obj):
-        user = self.context.get("request").user
-        subscriptions = user.subscriptions.all()
-        images = [
-            subscription.service.image.url for subscription in subscriptions
-        ]
-        return images
+        return self.context["dashboard"].images
 
     def get_nearest_payment_date(self, obj):
-        user = self.context.get("request").user
-        nearest_payment = (
-            Payment.objects.filter(user=user, service__pk=obj.pk)
-            .order_by("next_payment_date")
-            .first()
+        nearest_payment = self.context["dashboard"].nearest_payments.get(
+            obj.pk
         )
         if nearest_payment:
             return nearest_payment.next_payment_date
         return None
 
     def get_next_payment_amount(self, obj):
-        user = self.context.get("request").user
-        next_payment_amount = (
-            Payment.objects.filter(user=user, service=obj)
-            .order_by("next_payment_date")
-            .first()
+        next_payment_amount = self.context["dashboard"].nearest_payments.get(
+            obj.pk
         )
         if next_payment_amount:
             return next_payment_amount.tariff_kind.cost_total
         return None
 
     def get_new(self, obj):
-        """Функция-счетчик для определения, является ли сервис новым."""
-        today = datetime.date.today()
-        delta_days = (today - obj.pub_date.date()).days
-        new_services = Service.objects.filter(new=True)
-        if delta_days >= 60:
-            obj.new = False
-            obj.save()
-            old_services = Service.objects.filter(new=False)
-            return ServiceShortSerializer(old_services, many=True).data
-        return ServiceShortSerializer(new_services, many=True).data
+        """Список новых сервисов, если сервис еще новый, иначе старых.
+
+        Флаг new пересчитывается командой refresh_service_flags.
+        """
+        dashboard = self.context["dashboard"]
+        if obj.new:
+            return dashboard.new_services
+        return dashboard.old_services
 
     def get_popular(self, obj):
-        """Получение состояния популярности."""
-
-        user = self.context.get("request").user
-        subscriptions = obj.subscriptions.filter(user=user)
-        if subscriptions.count() >= 50:
-            obj.popular = True
-            obj.save()
-            popular_services = Service.objects.filter(popular=True)
-            return ServiceShortSerializer(popular_services, many=True).data
-        else:
-            average_ratings = self.get_average_ratings(obj)
-            if average_ratings <= 4:
-                non_popular_services = Service.objects.filter(
-                    rating__stars__lte=4
-                )
-                return ServiceShortSerializer(
-                    non_popular_services, many=True
-                ).data
-            popular_services = Service.objects.filter(rating__stars__gt=4)
-            return ServiceShortSerializer(popular_services, many=True).data
+        """Получение состояния популярности.
+
+        Флаг popular пересчитывается командой refresh_service_flags.
+        """
+
+        dashboard = self.context["dashboard"]
+        if obj.popular:
+            return dashboard.popular_services
+        average_ratings = self.get_average_ratings(obj)
+        if average_ratings <= 4:
+            return dashboard.low_rated_services
+        return dashboard.high_rated_services
 
     def get_categories(self, obj):
+        return self.context["dashboard"].categories
+
+
+class TariffKindSerializer(serializers.ModelSerializer):
+    """Сериализатор варианта тарифа в сетке цен."""
+
+    class Meta:
+        model = TariffKind
+        fields = (
+            "id",
+            "name",
+            "duration",
+            "cost_per_month",
+            "cost_total",
+        )
+
 
-        categories = Category.objects.all()
-        categories_data = CategorySerializer(categories, many=True).data
+class TariffGridSerializer(serializers.ModelSerializer):
+    """Сериализатор сервиса со всеми вариантами его тарифов."""
 
-        return categories_data
+    tariffs = TariffKindSerializer(
+        source="tariffs_services", many=True, read_only=True
+    )
+
+    class Meta:
+        model = Service
+        fields = (
+            "id",
+            "name",
+            "tariffs",
+        )
 
 
 class RatingSerializer(serializers.ModelSerializer):
-    average_ratings = SerializerMethodField()
+    average_ratings = serializers.ReadOnlyField(
+        source="service.average_rating"
+    )
 
     class Meta:
         model = Rating
         fields = "__all__"
 
-    def get_average_ratings(self, obj):
-        ratings = Rating.objects.filter(service=obj)
-        total_ratings = sum([rating.stars for rating in ratings])
-        if ratings:
-            return total_ratings / len(ratings)
-        return 0
+    def save(self, **kwargs):
+        rating = super().save(**kwargs)
+        # счетчики сервиса сдвинуты в базе при сохранении оценки
+        rating.service.refresh_from_db(fields=RATING_COUNTER_FIELDS)
+        return rating
 
 
 class CategoriesSerializer(serializers.ModelSerializer):
     """Сериализатор для подробного отображения содержания категории."""
 
-    average_ratings = SerializerMethodField()
+    average_ratings = serializers.ReadOnlyField(source="average_rating")
+    image = CachedBase64ImageField(rendition="medium", read_only=True)
 
     class Meta:
         model = Service
@@ -269,17 +262,11 @@ class CategoriesSerializer(serializers.ModelSerializer):
             "average_ratings",
         )
 
-    def get_average_ratings(self, obj):
-        ratings = Rating.objects.filter(service=obj)
-        total_ratings = sum([rating.stars for rating in ratings])
-        if ratings:
-            return total_ratings / len(ratings)
-        return 0
-
 
 class ServiceSerializer(serializers.ModelSerializer):
 
     category = serializers.ReadOnlyField(source="category.title")
+    image = CachedBase64ImageField(rendition="large", read_only=True)
 
     class Meta:
         model = Service
@@ -367,7 +354,9 @@ class PaymentSerializer(serializers.ModelSerializer):
 class PromocodeSerializer(serializers.ModelSerializer):
     """Cериализатор страницы с промокодом ."""
 
-    promo_code = serializers.SerializerMethodField()
+    promo_code = serializers.CharField(
+        source="subscription.promo_code", read_only=True
+    )
     promo_code_expiry_date = serializers.SerializerMethodField()
 
     class Meta:
@@ -378,22 +367,18 @@ class PromocodeSerializer(serializers.ModelSerializer):
             "promo_code_expiry_date"
         )
 
-    def get_promo_code(self, obj):
-        promo_code = "".join(
-            random.choices(string.ascii_letters + string.digits, k=12)
-        )
-        return promo_code
-
     def get_promo_code_expiry_date(self, obj):
-        return obj.payment_date + timedelta(days=7)
+        return obj.payment_date + timedelta(days=settings.PROMO_CODE_TTL_DAYS)
 
 
 class SellHistorySerializer(serializers.ModelSerializer):
     """Cериализатор истории платежей ."""
 
     service_name = serializers.CharField(source="service.name")
-    service_image = Base64ImageField(source="service.image")
-    payment_date = serializers.DateField(format="%d.%m.%y")
+    service_image = CachedBase64ImageField(
+        source="service.image", rendition="small", read_only=True
+    )
+    payment_date = serializers.DateTimeField(format="%d.%m.%y")
     amount = serializers.DecimalField(
         max_digits=8,
         decimal_places=2,
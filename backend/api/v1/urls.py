@@ -1,11 +1,15 @@
-from django.urls import include, path
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework import routers
 
-from .views import (CategoriesViewSet, CategoryViewSet, CustomUserViewSet,
-                    SellHistoryViewSet, ServiceViewSet, SubscribeView,
-                    SubscriptionPaidView, SubscriptionPaymentView,
-                    SubscriptionViewSet)
+from .async_views import async_view
+from .lazy import lazy_view
+from .views import (CacheStatsView, CategoriesViewSet, CategoryViewSet,
+                    CustomUserViewSet, DatabasePoolStatsView,
+                    ProfilingStatsView, SellHistoryViewSet, ServiceViewSet,
+                    SubscribeView, SubscriptionPaidView,
+                    SubscriptionPaymentView, SubscriptionViewSet,
+                    TariffGridViewSet)
 
 router_v1 = routers.DefaultRouter()
 router_v1.register(r"categories", CategoriesViewSet, basename="categories")
@@ -14,14 +18,39 @@ router_v1.register(r"services", ServiceViewSet, basename="services")
 router_v1.register(
     r"subscriptions", SubscriptionViewSet, basename="subscriptions"
 )
+router_v1.register(r"tariffs", TariffGridViewSet, basename="tariffs")
 router_v1.register(
     r'sell_history', SellHistoryViewSet, basename="sell_history"
 )
 
+catalog_view = CategoryViewSet.as_view({"get": "list"})
 
-urlpatterns = [
+# В режиме ASGI чтение сервисов и каталога обслуживают async-представления,
+# они стоят раньше маршрутов роутера с теми же адресами.
+async_urlpatterns = []
+if settings.ASYNC_VIEWS:
+    catalog_view = async_view(catalog_view)
+    async_urlpatterns = [
+        path(
+            "services/",
+            async_view(ServiceViewSet.as_view({"get": "list"})),
+            name="services-list",
+        ),
+        re_path(
+            r"^services/(?P<pk>[^/.]+)/$",
+            async_view(ServiceViewSet.as_view({"get": "retrieve"})),
+            name="services-detail",
+        ),
+    ]
+
+urlpatterns = async_urlpatterns + [
     path("", include(router_v1.urls)),
-    path("catalog/", CategoryViewSet.as_view({"get": "list"}), name="catalog"),
+    path("catalog/", catalog_view, name="catalog"),
+    path("cache_stats/", CacheStatsView.as_view(), name="cache_stats"),
+    path("profiling/", ProfilingStatsView.as_view(), name="profiling"),
+    path(
+        "db_pool_stats/", DatabasePoolStatsView.as_view(), name="db_pool_stats"
+    ),
     path("subscribe/", SubscribeView.as_view(), name="subscribe"),
     path(
         "subscription_payment/",
@@ -45,6 +74,23 @@ urlpatterns = [
     ),
     path("", include("djoser.urls")),
     path("", include("djoser.urls.authtoken")),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
-    path("schema/docs/", SpectacularSwaggerView.as_view(url_name="schema")),
 ]
+
+if settings.JWT_AUTH_ENABLED:
+    urlpatterns += [path("", include("djoser.urls.jwt"))]
+
+if settings.API_SCHEMA_ENABLED:
+    urlpatterns += [
+        path(
+            "schema/",
+            lazy_view("drf_spectacular.views.SpectacularAPIView"),
+            name="schema",
+        ),
+        path(
+            "schema/docs/",
+            lazy_view(
+                "drf_spectacular.views.SpectacularSwaggerView",
+                url_name="schema",
+            ),
+        ),
+    ]
@@ -1,24 +1,38 @@
-import datetime
+from functools import partial
 
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from django.shortcuts import redirect
+from django.utils import timezone
 from djoser.views import UserViewSet
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from payments.models import Payment, TariffKind
+from payments.models import Cashback, Payment, SpendingLedger, TariffKind
+from services.cache import cache_stats
+from services.catalog import category_catalog_queryset, get_category_catalog
+from services.db import pool_stats, reset_pool_stats
 from services.models import Category, Rating, Service, Subscription
+from services.promocodes import (PromoCodeContention, PromoCodePoolEmpty,
+                                 allocate_promo_code)
+from .cache import CachedResponseMixin, ConditionalGetMixin
+from .dashboard import MainPageDashboard
+from .idempotency import idempotent
+from .pagination import SellHistoryPagination
 from .permissions import IsOwner
+from .profiling import route_stats
+from .replicas import ReplicaReadMixin
 from .serializers import (CategoriesSerializer, CategorySerializer,
                           CustomUserSerializer, PaymentSerializer,
                           PromocodeSerializer, RatingSerializer,
                           SellHistorySerializer, ServiceMainPageSerializer,
-                          ServiceSerializer, SubscriptionSerializer)
+                          ServiceSerializer, SubscriptionSerializer,
+                          TariffGridSerializer)
 
 User = get_user_model()
 
@@ -34,16 +48,40 @@ class CustomUserViewSet(UserViewSet):
         return super().get_permissions()
 
 
-class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
+class ServiceViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """Представление главной страницы,
     списков сервисов и отдельного сервиса,
     Обрабатывает запросы к главной странице,
     каталогам сервисов и странице отдельного сервиса.
+    Кэшируется только страница сервиса: главная зависит от пользователя.
     """
 
     serializer_class = ServiceMainPageSerializer
     queryset = Service.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    cache_models = (Service, Category)
+    cache_actions = ("retrieve",)
+    cache_publication = True
+    conditional_per_user = True
+    conditional_publication = cache_publication
+
+    def get_conditional_models(self):
+        if self.action == "retrieve":
+            return self.cache_models
+        return (
+            Service,
+            Category,
+            Rating,
+            Subscription,
+            Payment,
+            Cashback,
+            SpendingLedger,
+        )
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -51,21 +89,127 @@ class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
         return super().get_serializer_class()
 
     def get_queryset(self):
-        return Service.objects.filter(pub_date__lte=datetime.datetime.now())
+        queryset = Service.objects.filter(pub_date__lte=timezone.now())
+        if self.action == "retrieve":
+            return queryset.select_related("category")
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["dashboard"] = MainPageDashboard(self.request.user)
+        return context
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """Представление категорий - кино, музыка, книги итд."""
 
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
+    cache_models = (Category, Service)
+    conditional_models = cache_models
+
+    def get_queryset(self):
+        return category_catalog_queryset()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            partial(self.cached_response, self.list_catalog),
+            request,
+            *args,
+            **kwargs,
+        )
+
+    def list_catalog(self, request, *args, **kwargs):
+        serializer = self.get_serializer(get_category_catalog(), many=True)
+        return Response(serializer.data)
 
 
-class CategoriesViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoriesViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """Представление отдельных категорий со всеми сервисами."""
 
     serializer_class = CategoriesSerializer
     queryset = Service.objects.select_related("category").all()
+    cache_models = (Service, Category, Rating)
+    conditional_models = cache_models
+
+
+class TariffGridViewSet(
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Сетка цен: все сервисы с длительностями и ценами тарифов.
+
+    Тарифы подгружаются одним запросом для всех сервисов сразу, а цены
+    берутся из сохраненных полей тарифа без пересчета скидок. Ответ
+    кэшируется до изменения сервисов или тарифов.
+    """
+
+    serializer_class = TariffGridSerializer
+    cache_models = (Service, TariffKind)
+    conditional_models = cache_models
+    cache_publication = True
+    conditional_publication = cache_publication
+
+    def get_queryset(self):
+        return (
+            Service.objects.filter(pub_date__lte=timezone.now())
+            .only("id", "name")
+            .order_by("pk")
+            .prefetch_related(
+                Prefetch(
+                    "tariffs_services",
+                    queryset=TariffKind.objects.order_by("duration"),
+                )
+            )
+        )
+
+
+class CacheStatsView(APIView):
+    """Счетчики попаданий и промахов кэша текущего процесса."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(cache_stats.snapshot(), status=status.HTTP_200_OK)
+
+
+class ProfilingStatsView(APIView):
+    """Сводка профилирования запросов текущего процесса по маршрутам."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(route_stats.snapshot(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        route_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DatabasePoolStatsView(APIView):
+    """Счетчики пула соединений с базой текущего процесса."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(pool_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        reset_pool_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class SubscribeView(GenericAPIView):
@@ -73,16 +217,23 @@ class SubscribeView(GenericAPIView):
 
     serializer_class = SubscriptionSerializer
     queryset = Subscription.objects.all()
+    permission_classes = (IsAuthenticated,)
 
+    @idempotent
     def post(self, request):
         service_id = request.data.get("service_id")
         user = request.user
         try:
             service = Service.objects.get(id=service_id)
-            Subscription.objects.create(user=user, service=service)
-            return Response(status=status.HTTP_200_OK)
-        except Service.DoesNotExist:
+        except (Service.DoesNotExist, ValueError, TypeError):
             return Response(status=status.HTTP_404_NOT_FOUND)
+        # повтор оформления не должен падать на unique_subscription
+        Subscription.objects.get_or_create(
+            user=user,
+            service=service,
+            defaults={"activation_status": 3},
+        )
+        return Response(status=status.HTTP_200_OK)
 
 
 class SubscriptionPaymentView(GenericAPIView):
@@ -90,7 +241,9 @@ class SubscriptionPaymentView(GenericAPIView):
 
     serializer_class = PaymentSerializer
     queryset = Payment.objects.all()
+    permission_classes = (IsAuthenticated,)
 
+    @idempotent
     def post(self, request):
         callback = True
         if callback:
@@ -106,31 +259,54 @@ class SubscriptionPaidView(APIView):
     """Страница с промокодом - открывается
     после успешной оплаты подписки."""
 
-    def post(self, request):
-        total = request.data.get('total')
-        serializer = PromocodeSerializer(data={'total': total})
-        serializer.is_valid(raise_exception=True)
-        promo_code = serializer.data.get('promo_code')
-        promo_code_expiry_date = serializer.data.get('promo_code_expiry_date')
+    permission_classes = (IsAuthenticated,)
 
+    def post(self, request):
+        payment = (
+            Payment.objects.filter(
+                user=request.user,
+                subscription_id=request.data.get("subscription_id"),
+                callback="accepted",
+            )
+            .select_related("subscription")
+            .order_by("-payment_date")
+            .first()
+        )
+        if payment is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        try:
+            allocate_promo_code(payment.subscription)
+        except PromoCodePoolEmpty:
+            return Response(
+                {"message": "Промокоды временно закончились"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        except PromoCodeContention:
+            return Response(
+                {"message": "Не удалось выдать промокод, повторите запрос"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
         return Response(
-            {
-                'total': total,
-                'promo_code': promo_code,
-                'promo_code_expiry_date': promo_code_expiry_date,
-            },
-            status=status.HTTP_200_OK,
+            PromocodeSerializer(payment).data, status=status.HTTP_200_OK
         )
 
 
-class SellHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class SellHistoryViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
 
     serializer_class = SellHistorySerializer
     queryset = Payment.objects.all()
+    conditional_models = (Payment, Cashback, Service)
+    conditional_per_user = True
+    pagination_class = SellHistoryPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Payment.objects.filter(user=user)
+        return Payment.objects.filter(user=user).select_related(
+            "service", "cashbacks"
+        )
 
 
 class SubscriptionViewSet(viewsets.ViewSet):
@@ -218,7 +394,7 @@ class SubscriptionViewSet(viewsets.ViewSet):
 
 class RatingViewSet(viewsets.ModelViewSet):
     serializer_class = RatingSerializer
-    queryset = Rating.objects.all()
+    queryset = Rating.objects.select_related("service")
 
     def get_permissions(self):
         if self.action == "create":
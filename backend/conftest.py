@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from rest_framework.test import APIClient
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(tmp_path_factory):
+    # тестовая база в файле: к ней подключаются и дочерние процессы
+    settings.DATABASES["default"]["TEST"]["NAME"] = str(
+        tmp_path_factory.mktemp("db") / "test.sqlite3"
+    )
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def manage(transactional_db):
+    """Запускает команду manage.py в отдельном процессе на тестовой базе."""
+
+    def manage(*args):
+        return subprocess.run(
+            [sys.executable, "manage.py", *args],
+            cwd=settings.BASE_DIR,
+            env=dict(os.environ, SQLITE_PATH=connection.settings_dict["NAME"]),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    return manage
+
+
+@pytest.fixture
+def migrate(transactional_db):
+    """Переводит тестовую базу на заданные миграции.
+
+    Без аргументов база переводится на последние миграции. Возвращает
+    реестр исторических моделей после миграции. После теста база
+    возвращается к последним миграциям.
+    """
+    executor = MigrationExecutor(connection)
+
+    def migrate(*targets):
+        executor.loader.build_graph()
+        targets = list(targets) or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    yield migrate
+    migrate()
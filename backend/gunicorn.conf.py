@@ -0,0 +1,16 @@
+"""Настройки gunicorn, файл читается из рабочего каталога сам.
+
+По умолчанию pay2u.wsgi обслуживают синхронные воркеры.
+SERVER_MODE=asgi запускает pay2u.asgi в воркерах uvicorn: чтение
+каталога тогда идет через async-представления и пул потоков ORM.
+Число воркеров gunicorn берет из WEB_CONCURRENCY.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+if os.getenv("SERVER_MODE", "wsgi").lower() == "asgi":
+    wsgi_app = "pay2u.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "pay2u.wsgi:application"
@@ -0,0 +1,41 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+LIMIT_POSTS_PER_PAGE = 15
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Администрирование фоновых задач."""
+
+    list_display = (
+        "name",
+        "status",
+        "attempts",
+        "run_at",
+        "locked_by",
+    )
+    list_filter = (
+        "status",
+        "name",
+    )
+    readonly_fields = (
+        "attempts",
+        "locked_by",
+        "locked_at",
+        "last_error",
+        "created_at",
+    )
+    actions = ("retry",)
+    list_per_page = LIMIT_POSTS_PER_PAGE
+
+    @admin.action(description="Повторить выбранные задачи")
+    def retry(self, request, queryset):
+        queryset.update(
+            status=Job.PENDING,
+            attempts=0,
+            locked_by=None,
+            run_at=timezone.now(),
+        )
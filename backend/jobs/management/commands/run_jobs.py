@@ -0,0 +1,125 @@
+import logging
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from jobs.queue import claim_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая пауза в секундах между попытками после ошибок базы.
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет фоновые задачи из очереди. Можно запускать в "
+        "нескольких процессах и на нескольких серверах одновременно."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Число потоков, выполняющих задачи.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Сколько задач поток забирает за раз.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help="Пауза в секундах, когда очередь пуста.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить готовые задачи и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: self.stop.set())
+        self.processed = self.failed = self.errors = 0
+        self.lock = threading.Lock()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{prefix}:{number}", options),
+                daemon=True,
+            )
+            for number in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Выполнено задач: {self.processed}, с ошибкой: {self.failed}"
+            )
+        )
+        if self.errors and options["once"]:
+            raise CommandError(f"Ошибок базы данных: {self.errors}")
+
+    def work(self, worker, options):
+        """Цикл потока: забирает и выполняет задачи до остановки.
+
+        Ошибка базы не завершает поток: соединение закрывается, и после
+        паузы, растущей вдвое до MAX_BACKOFF секунд, поток продолжает
+        работу. Задачи, взятые до ошибки, выдаются снова через
+        JOB_LOCK_TIMEOUT. С --once поток после ошибки завершается,
+        а команда - с ошибкой.
+        """
+        errors = 0
+        try:
+            while not self.stop.is_set():
+                try:
+                    idle = self.work_batch(worker, options)
+                except DatabaseError:
+                    logger.exception("Ошибка базы данных в %s", worker)
+                    connection.close()
+                    with self.lock:
+                        self.errors += 1
+                    if options["once"]:
+                        return
+                    errors += 1
+                    self.stop.wait(
+                        min(options["poll_interval"] * 2 ** errors,
+                            MAX_BACKOFF)
+                    )
+                    continue
+                errors = 0
+                if idle:
+                    if options["once"]:
+                        return
+                    self.stop.wait(options["poll_interval"])
+        finally:
+            connection.close()
+
+    def work_batch(self, worker, options):
+        """Выполняет одну пачку задач, возвращает True, если их не было."""
+        jobs = claim_jobs(worker, options["batch_size"])
+        for job in jobs:
+            succeeded = run_job(job)
+            with self.lock:
+                self.processed += succeeded
+                self.failed += not succeeded
+        return not jobs
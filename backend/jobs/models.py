@@ -0,0 +1,57 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе данных.
+
+    Выполненные задачи удаляются, задачи, исчерпавшие попытки,
+    остаются в таблице со статусом «отклонена» до разбора.
+    """
+
+    PENDING = 1
+    RUNNING = 2
+    DEAD = 3
+    STATUS_CHOICES = (
+        (PENDING, "ожидает"),
+        (RUNNING, "выполняется"),
+        (DEAD, "отклонена"),
+    )
+
+    name = models.CharField("Обработчик", max_length=100)
+    payload = models.JSONField("Аргументы", default=dict, blank=True)
+    status = models.PositiveSmallIntegerField(
+        "Статус",
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        "Наибольшее число попыток",
+        default=3,
+    )
+    run_at = models.DateTimeField("Выполнить после", default=timezone.now)
+    locked_by = models.CharField(
+        "Обработчик очереди",
+        max_length=100,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    locked_at = models.DateTimeField(blank=True, null=True, editable=False)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created_at = models.DateTimeField("Создана", auto_now_add=True)
+
+    class Meta:
+        ordering = ("run_at",)
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(
+                fields=["status", "run_at"],
+                name="job_status_run_at_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
@@ -0,0 +1,115 @@
+"""Очередь фоновых задач в базе данных без отдельного брокера.
+
+Обработчики регистрируются декоратором job в модулях jobs.py
+приложений, задачи ставятся в очередь функцией enqueue и выполняются
+командой run_jobs. Задача, обработчик которой упал или завис, может
+выполниться повторно, поэтому обработчики должны быть идемпотентными.
+"""
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(name, max_attempts=3):
+    """Регистрирует функцию как обработчик задач с именем name.
+
+    Аргументы задачи передаются обработчику именованными и должны
+    сохраняться в JSON.
+    """
+
+    def register(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+
+    return register
+
+
+def enqueue(name, /, run_at=None, **payload):
+    """Ставит задачу в очередь и сразу возвращает управление.
+
+    Запись задачи входит в текущую транзакцию, поэтому обработчик
+    не увидит задачу раньше, чем данные, ради которых она создана.
+    При JOB_QUEUE_EAGER задача выполняется сразу после фиксации
+    транзакции в текущем процессе.
+    """
+    func, max_attempts = _handlers[name]
+    if settings.JOB_QUEUE_EAGER:
+        transaction.on_commit(lambda: func(**payload))
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim_jobs(worker, limit, now=None):
+    """Забирает в работу до limit готовых к выполнению задач.
+
+    Задача помечается именем обработчика условным UPDATE, поэтому
+    одна задача достается одному из параллельных обработчиков. Задачи
+    обработчика, не отчитавшегося за JOB_LOCK_TIMEOUT секунд, считаются
+    брошенными и выдаются снова.
+    """
+    now = now or timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    available = Q(status=Job.PENDING, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_at__lt=stale
+    )
+    with transaction.atomic():
+        candidates = Job.objects.filter(available)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(
+            candidates.order_by("run_at").values_list("pk", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(available, pk__in=ids).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(pk__in=ids, locked_by=worker))
+
+
+def run_job(job):
+    """Выполняет задачу, удаляя ее при успехе.
+
+    При ошибке задача откладывается на JOB_RETRY_DELAY * 2 ** n секунд,
+    а после max_attempts попыток остается со статусом «отклонена».
+    Возвращает True, если задача выполнена.
+    """
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        func, _ = _handlers[job.name]
+        func(**job.payload)
+    except Exception:
+        logger.exception("Ошибка фоновой задачи %s", job)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            owned.update(status=Job.DEAD, locked_by=None, last_error=error)
+            return False
+        delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        owned.update(
+            status=Job.PENDING,
+            locked_by=None,
+            last_error=error,
+            run_at=timezone.now() + datetime.timedelta(seconds=delay),
+        )
+        return False
+    owned.delete()
+    return True
@@ -0,0 +1,34 @@
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError
+
+from jobs.management.commands.run_jobs import Command
+
+CLAIM_JOBS = "jobs.management.commands.run_jobs.claim_jobs"
+
+
+@pytest.mark.django_db
+def test_worker_survives_database_error():
+    command = Command()
+
+    def claim_jobs(worker, limit):
+        if claim.call_count == 1:
+            raise OperationalError("server closed the connection")
+        command.stop.set()
+        return []
+
+    with mock.patch(CLAIM_JOBS, side_effect=claim_jobs) as claim:
+        call_command(command, concurrency=1, poll_interval=0)
+    assert claim.call_count == 2
+    assert command.errors == 1
+
+
+@pytest.mark.django_db
+def test_once_fails_on_database_error():
+    error = OperationalError("server closed the connection")
+    with mock.patch(CLAIM_JOBS, side_effect=error):
+        with pytest.raises(CommandError):
+            call_command("run_jobs", concurrency=1, once=True)
@@ -1,10 +1,8 @@
 import os
 from pathlib import Path
 
-import sentry_sdk
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
-from sentry_sdk.integrations.django import DjangoIntegration
 
 load_dotenv()
 
@@ -31,18 +29,30 @@ THIRD_PARTY_APPS = [
     "rest_framework.authtoken",
     "djoser",
     "django_filters",
-    "drf_spectacular",
     "corsheaders",
+    "push_notifications",
 ]
 
+# Схема OpenAPI и страница документации /api/v1/schema/docs/. Без
+# API_SCHEMA_ENABLED drf_spectacular не загружается вовсе. С ним
+# приложение drf_spectacular загружается при старте, а представления
+# схемы импортируются только при первом запросе к ней.
+API_SCHEMA_ENABLED = os.getenv("API_SCHEMA_ENABLED", "true").lower() == "true"
+if API_SCHEMA_ENABLED:
+    THIRD_PARTY_APPS.append("drf_spectacular")
+
 LOCAL_APPS = [
     "services.apps.ServicesConfig",
     "payments.apps.PaymentsConfig",
     "users.apps.UsersConfig",
+    "jobs.apps.JobsConfig",
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
+# Ключ моделей сторонних приложений, совпадающий с их миграциями.
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -50,12 +60,29 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.v1.replicas.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Профилирование запросов: заголовок Server-Timing и сводка по маршрутам
+# на /api/v1/profiling/. Замеряется доля запросов PROFILING_SAMPLE_RATE,
+# сводка хранит последние PROFILING_WINDOW замеров каждого маршрута.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.1))
+PROFILING_WINDOW = int(os.getenv("PROFILING_WINDOW", 500))
+if PROFILING_ENABLED:
+    MIDDLEWARE.append("api.v1.profiling.ProfilingMiddleware")
+
 ROOT_URLCONF = "pay2u.urls"
 
+# Режим ASGI (pay2u.asgi включает его сам): чтение каталога обслуживают
+# async-представления, а ORM работает в пуле из ORM_THREAD_POOL_SIZE
+# потоков. У каждого потока свое соединение с БД, поэтому размер пула
+# вместе с числом воркеров ограничен числом соединений базы.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "").lower() == "true"
+ORM_THREAD_POOL_SIZE = int(os.getenv("ORM_THREAD_POOL_SIZE", 8))
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -75,25 +102,158 @@ TEMPLATES = [
 WSGI_APPLICATION = "pay2u.wsgi.application"
 
 
+# Пул соединений с базой в каждом процессе (services.db): сколько
+# соединений держать открытыми (0 выключает пул), сколько секунд ждать
+# свободного, через сколько секунд простоя закрывать соединение и после
+# какого простоя проверять его перед выдачей. Пул на воркер вместе с
+# числом воркеров ограничен max_connections PostgreSQL.
+DB_POOL = {
+    "SIZE": int(os.getenv("DB_POOL_SIZE", 10)),
+    "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    "IDLE_TIMEOUT": int(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+    "HEALTH_CHECK_INTERVAL": int(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30)),
+}
+
 if os.getenv("DEBUG", "True") == "True" or "true":
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+            "ENGINE": "services.db.sqlite3",
+            "NAME": os.getenv(
+                "SQLITE_PATH", os.path.join(BASE_DIR, "db.sqlite3")
+            ),
+            "POOL": DB_POOL,
         }
     }
 else:
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.postgresql",
+            "ENGINE": "services.db.postgresql",
             "NAME": os.getenv("POSTGRES_DB", "pay2u_db"),
             "USER": os.getenv("POSTGRES_USER", "pay2u_admin"),
             "PASSWORD": os.getenv("POSTFRES_PASSWORD", "secret_password"),
             "HOST": os.getenv("DB_HOST", ""),
             "PORT": os.getenv("DB_PORT", 5432),
+            "POOL": DB_POOL,
         }
     }
 
+# Реплики только для чтения (services.db.routing). Чтения каталога,
+# сервисов и истории покупок уходят в случайную реплику, записи - в
+# default. После изменяющего запроса чтения пользователя
+# DB_REPLICA_STICKY_SECONDS секунд идут в default; отметка хранится в
+# кэше DB_REPLICA_CACHE_ALIAS, общем для всех воркеров: следующий запрос
+# пользователя может попасть в другой. Реплики PostgreSQL задает DB_REPLICA_HOSTS через запятую, для
+# SQLite SQLITE_REPLICAS - число псевдонимов того же файла, которые
+# заменяют реплики при разработке и проверках.
+if DATABASES["default"]["ENGINE"] == "services.db.sqlite3":
+    replica_hosts = [None] * int(os.getenv("SQLITE_REPLICAS", 0))
+else:
+    replica_hosts = [
+        host.strip()
+        for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+        if host.strip()
+    ]
+for number, host in enumerate(replica_hosts, start=1):
+    replica = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+    if host:
+        replica["HOST"] = host
+    DATABASES[f"replica_{number}"] = replica
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["services.db.routing.ReplicaRouter"]
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+DB_REPLICA_CACHE_ALIAS = os.getenv("DB_REPLICA_CACHE_ALIAS", "shared")
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "pay2u"),
+    },
+    # Общий для веб-воркеров, worker и периодических команд кэш в базе
+    # данных, таблицу создает manage.py createcachetable.
+    "shared": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "pay2u_cache",
+    },
+}
+
+# Версии моделей (services.cache), из которых строятся ключи кэшей и ETag.
+# Их меняют и запросы к API, и фоновые задачи с периодическими командами
+# в других процессах, поэтому CACHE_VERSION_ALIAS должен быть общим для
+# всех процессов кэшем. Версия живет CACHE_VERSION_TIMEOUT секунд и затем
+# обновляется: процесс, не увидевший изменения, отдает устаревшие данные
+# и отвечает 304 не дольше этого времени.
+CACHE_VERSION_ALIAS = os.getenv("CACHE_VERSION_ALIAS", "shared")
+CACHE_VERSION_TIMEOUT = int(os.getenv("CACHE_VERSION_TIMEOUT", 300))
+
+# Время жизни закэшированного каталога в секундах. Ключи каталога строятся
+# из версий моделей в общем кэше, поэтому изменения видны всем воркерам
+# сразу, а таймаут лишь ограничивает, сколько живут записи прежних версий.
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 300))
+
+# Кэш ответов публичных эндпоинтов каталога: алиас из CACHES и время жизни.
+API_CACHE_ALIAS = os.getenv("API_CACHE_ALIAS", "default")
+API_CACHE_TIMEOUT = int(os.getenv("API_CACHE_TIMEOUT", 300))
+
+# Ключи идемпотентности POST-запросов: алиас кэша, время хранения
+# ответа и время, на которое ключ занимает выполняющийся запрос, в секундах.
+# Повторы попадают в другие воркеры, поэтому по умолчанию ответы хранятся
+# в общем кэше "shared".
+IDEMPOTENCY_CACHE_ALIAS = os.getenv("IDEMPOTENCY_CACHE_ALIAS", "shared")
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 60 * 60 * 24))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+
+# Аутентификация (users.authentication): пользователь по токену берется из
+# кэша AUTH_CACHE_ALIAS, записи живут AUTH_CACHE_TIMEOUT секунд, 0 отключает
+# кэш. Выход, удаление токена и изменение пользователя сбрасывают записи в
+# кэше того процесса, где они произошли, поэтому LocMemCache используется
+# только при одном воркере gunicorn (WEB_CONCURRENCY). При нескольких
+# воркерах пользователь читается из базы, пока AUTH_CACHE_ALIAS не указывает
+# на общий кэш, например memcached через CACHE_BACKEND. Кэш в базе "shared"
+# по умолчанию не берется: он стоил бы двух запросов вместо одного.
+# С JWT_AUTH_ENABLED принимаются и JWT simplejwt (заголовок
+# Authorization: Bearer), их выдает /api/v1/jwt/create/.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+AUTH_CACHE_ALIAS = os.getenv("AUTH_CACHE_ALIAS", "default")
+AUTH_CACHE_TIMEOUT = int(os.getenv("AUTH_CACHE_TIMEOUT", 60))
+JWT_AUTH_ENABLED = os.getenv("JWT_AUTH_ENABLED", "").lower() == "true"
+
+# Время жизни закодированных в base64 изображений в кэше.
+IMAGE_CACHE_TIMEOUT = int(os.getenv("IMAGE_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Пуш-уведомления: транспорт, размер пачки, число потоков отправки,
+# попытки с паузой PUSH_BACKOFF * 2 ** n секунд и за сколько дней
+# напоминать об окончании подписки. Без PUSH_TRANSPORT уведомления
+# уходят через APNs, если задан APNS_CERTIFICATE, иначе только пишутся
+# в журнал, а списания и задачи работают как обычно.
+PUSH_TRANSPORT = os.getenv("PUSH_TRANSPORT", "")
+PUSH_BATCH_SIZE = int(os.getenv("PUSH_BATCH_SIZE", 100))
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", 4))
+PUSH_MAX_ATTEMPTS = int(os.getenv("PUSH_MAX_ATTEMPTS", 3))
+PUSH_BACKOFF = float(os.getenv("PUSH_BACKOFF", 1.0))
+PUSH_EXPIRY_NOTICE_DAYS = int(os.getenv("PUSH_EXPIRY_NOTICE_DAYS", 3))
+PUSH_NOTIFICATIONS_SETTINGS = {
+    "APNS_CERTIFICATE": os.getenv("APNS_CERTIFICATE", ""),
+    "APNS_TOPIC": os.getenv("APNS_TOPIC", ""),
+    "APNS_USE_SANDBOX": os.getenv("APNS_USE_SANDBOX", "").lower() == "true",
+}
+
+# Очередь фоновых задач: число потоков run_jobs, пауза опроса пустой
+# очереди, пауза перед повтором JOB_RETRY_DELAY * 2 ** n и время, после
+# которого задача зависшего обработчика выдается снова, в секундах.
+# JOB_QUEUE_EAGER выполняет задачи сразу, без обработчика очереди.
+JOB_QUEUE_EAGER = os.getenv("JOB_QUEUE_EAGER", "").lower() == "true"
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", 30))
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", 600))
+
+# Пул промокодов: сколько свободных кодов держит refill_promo_codes
+# и сколько дней действует выданный код.
+PROMO_CODE_POOL_SIZE = int(os.getenv("PROMO_CODE_POOL_SIZE", 10000))
+PROMO_CODE_TTL_DAYS = int(os.getenv("PROMO_CODE_TTL_DAYS", 7))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -129,13 +289,18 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+if JWT_AUTH_ENABLED:
+    REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"].append(
+        "users.jwt.CachedJWTAuthentication"
+    )
+if API_SCHEMA_ENABLED:
+    REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"] = "drf_spectacular.openapi.AutoSchema"
 
 DJOSER = {
     "LOGIN_FIELD": "email",
@@ -153,6 +318,18 @@ DJOSER = {
         "user": "api.v1.serializers.CustomUserSerializer",
         "user_create": "api.v1.serializers.CreateCustomUserSerializer",
     },
+    "EMAIL": {
+        "activation": "users.emails.ActivationEmail",
+        "confirmation": "users.emails.ConfirmationEmail",
+        "password_reset": "users.emails.PasswordResetEmail",
+        "password_changed_confirmation": (
+            "users.emails.PasswordChangedConfirmationEmail"
+        ),
+        "username_changed_confirmation": (
+            "users.emails.UsernameChangedConfirmationEmail"
+        ),
+        "username_reset": "users.emails.UsernameResetEmail",
+    },
 }
 
 # Для дополнительной фиксации, что подписка активирована и отправки пуш уведомлений
@@ -180,11 +357,22 @@ CORS_ALLOWED_ORIGINS = [
     "https://pay2u.myddns.me",
 ]
 
-sentry_sdk.init(
-    dsn="https://5e0ea6ace6a9826158e07c5df0a05dcc@o4506547207077888.ingest.us.sentry.io/4507044762681344",
-    integrations=[
-        DjangoIntegration(),
-    ],
-    traces_sample_rate=1.0,
-    send_default_pii=True,
-)
+# Sentry включается, только если задан SENTRY_DSN: без него sentry_sdk
+# не импортируется. На сервере SENTRY_DSN обязателен: без него при
+# DEBUG=False не проходит manage.py check --deploy (services.checks),
+# который выполняется при деплое. Трассируется доля запросов SENTRY_TRACES_SAMPLE_RATE,
+# трассировка каждого запроса заметно замедляет ответы.
+SENTRY_DSN = os.getenv("SENTRY_DSN", "")
+SENTRY_TRACES_SAMPLE_RATE = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", 0.1))
+if SENTRY_DSN:
+    import sentry_sdk
+    from sentry_sdk.integrations.django import DjangoIntegration
+
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        integrations=[
+            DjangoIntegration(),
+        ],
+        traces_sample_rate=SENTRY_TRACES_SAMPLE_RATE,
+        send_default_pii=True,
+    )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Cashback, Payment, TariffKind
+from .models import Cashback, Payment, SpendingLedger, TariffKind
 
 LIMIT_POSTS_PER_PAGE = 15
 
@@ -82,3 +82,23 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = ("payment",)
     search_fields = ("payment",)
     list_editable = ("amount",)
+
+
+@admin.register(SpendingLedger)
+class SpendingLedgerAdmin(admin.ModelAdmin):
+    """Просмотр сводок расходов, редактируются только пересчетом."""
+
+    list_display = (
+        "user",
+        "total_spent",
+        "total_cashback",
+        "payments_count",
+    )
+    readonly_fields = (
+        "user",
+        "total_spent",
+        "total_cashback",
+        "payments_count",
+    )
+    search_fields = ("user__username",)
+    list_per_page = LIMIT_POSTS_PER_PAGE
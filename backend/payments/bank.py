@@ -0,0 +1,40 @@
+"""Заглушка платежного шлюза банка для списаний по автоплатежу."""
+import random
+import threading
+import time
+
+
+class SimulatedBank:
+    """Имитация банка: пакетное списание с ключами идемпотентности.
+
+    Повторное списание с тем же ключом возвращает прежний результат
+    и деньги второй раз не списывает, как это делают настоящие шлюзы.
+    decline_rate - доля отклоненных списаний, latency - задержка
+    ответа на пакет в секундах.
+    """
+
+    def __init__(self, decline_rate=0.0, latency=0.0, seed=None):
+        self.decline_rate = decline_rate
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._results = {}
+        self.charged = 0
+
+    def charge_batch(self, charges):
+        """Списывает суммы по списку пар (ключ идемпотентности, сумма).
+
+        Возвращает словарь: ключ - принято ли списание банком.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        results = {}
+        with self._lock:
+            for key, amount in charges:
+                if key not in self._results:
+                    accepted = self._random.random() >= self.decline_rate
+                    self._results[key] = accepted
+                    if accepted:
+                        self.charged += amount
+                results[key] = self._results[key]
+        return results
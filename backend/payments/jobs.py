@@ -0,0 +1,26 @@
+"""Фоновые задачи приложения payments."""
+from jobs.queue import job
+from .models import Payment
+from .push import PushDispatcher, payment_message
+from .tasks import accrue_cashbacks
+
+
+@job("payments.accrue_cashback")
+def accrue_cashback(payment_id):
+    """Начисляет кешбэк за платеж, если он еще не начислен."""
+    accrue_cashbacks(payment_ids=[payment_id])
+
+
+@job("payments.notify_payment")
+def notify_payment(payment_id):
+    """Отправляет пуш-уведомление о списании оплаты."""
+    payment = (
+        Payment.objects.select_related("service")
+        .filter(pk=payment_id)
+        .first()
+    )
+    if payment is None:
+        return
+    dispatcher = PushDispatcher()
+    dispatcher.enqueue_many([payment_message(payment, payment.service.name)])
+    dispatcher.flush()
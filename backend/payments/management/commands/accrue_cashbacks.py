@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.tasks import CASHBACK_CHUNK_SIZE, accrue_cashbacks
+
+
+class Command(BaseCommand):
+    help = (
+        "Начисляет кешбэк за принятые банком платежи, по которым он еще "
+        "не начислен. Повторный запуск безопасен."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=CASHBACK_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        accrued = accrue_cashbacks(chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обработано платежей: {accrued} за {elapsed:.2f} с"
+            )
+        )
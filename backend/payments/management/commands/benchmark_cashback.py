@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from payments.models import Cashback, Payment, SpendingLedger
+from payments.tasks import CASHBACK_CHUNK_SIZE, CENTS, accrue_cashbacks
+from services.diagnostics import test_database
+from services.seed import seed_dataset
+
+PAYMENT_BATCH_SIZE = 20000
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет пропускную способность начисления кешбэка на тестовой "
+        "базе с заданным числом платежей без кешбэка."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=1000000)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--services", type=int, default=50)
+        parser.add_argument(
+            "--chunk-size", type=int, default=CASHBACK_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            seed_dataset(
+                users=options["users"],
+                services=options["services"],
+                payments=1,
+                cashbacks=0,
+                seed=0,
+            )
+            self.add_payments(options["payments"])
+            total = Payment.objects.count()
+            self.stdout.write(f"Платежей без кешбэка: {total}")
+
+            started = time.perf_counter()
+            accrued = accrue_cashbacks(chunk_size=options["chunk_size"])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Начисление: {accrued} платежей за {elapsed:.2f} с, "
+                f"{accrued / elapsed:.0f} в секунду"
+            )
+
+            started = time.perf_counter()
+            repeated = accrue_cashbacks(chunk_size=options["chunk_size"])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Повторный запуск: {repeated} платежей за {elapsed:.2f} с"
+            )
+
+            cashback = Cashback.objects.aggregate(total=Sum("amount"))
+            ledgers = SpendingLedger.objects.aggregate(
+                total=Sum("total_cashback")
+            )
+            # SQLite суммирует десятичные значения во float
+            if Cashback.objects.count() != total or cashback[
+                "total"
+            ].quantize(CENTS) != ledgers["total"].quantize(CENTS):
+                raise CommandError("Кешбэк и сводки расходов не сходятся.")
+            amount = cashback["total"].quantize(CENTS)
+            self.stdout.write(
+                self.style.SUCCESS(f"Начислено кешбэка: {amount}")
+            )
+
+    def add_payments(self, target):
+        """Дополняет платежи до target копиями существующих."""
+        fields = [
+            field.attname
+            for field in Payment._meta.concrete_fields
+            if not field.primary_key
+        ]
+        templates = list(Payment.objects.order_by("pk").values(*fields))
+        created = len(templates)
+        while created < target:
+            size = min(PAYMENT_BATCH_SIZE, target - created)
+            Payment.objects.bulk_create(
+                [
+                    Payment(**templates[(created + number) % len(templates)])
+                    for number in range(size)
+                ]
+            )
+            created += size
@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from push_notifications.models import APNSDevice
+
+from payments.push import FakeTransport, PushDispatcher, PushMessage
+from services.diagnostics import record_queries, test_database
+from services.seed import UserFactory, _bulk_create
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет пропускную способность рассылки пуш-уведомлений "
+        "через локальный транспорт на тестовой базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument(
+            "--devices", type=int, default=2, help="Устройств на пользователя."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[1, 4, 8],
+            help="Размеры пула потоков для сравнения.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.02,
+            help="Задержка отправки пачки в секундах.",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.01,
+            help="Доля сообщений, не доставленных с первой попытки.",
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            users = _bulk_create(
+                UserFactory._meta.model,
+                UserFactory.build_batch(options["users"]),
+            )
+            APNSDevice.objects.bulk_create(
+                [
+                    APNSDevice(
+                        user=user, registration_id=f"{user.pk}-{number}"
+                    )
+                    for user in users
+                    for number in range(options["devices"])
+                ],
+                batch_size=1000,
+            )
+            messages = [
+                PushMessage(user.pk, "Ваша подписка истекает завтра.")
+                for user in users
+            ]
+            self.stdout.write(
+                f"{'потоков':>8}{'доставлено':>12}{'потеряно':>10}"
+                f"{'пачек':>8}{'запросов':>10}{'секунд':>9}{'в секунду':>11}"
+            )
+            for workers in options["workers"]:
+                transport = FakeTransport(
+                    failure_rate=options["failure_rate"],
+                    latency=options["latency"],
+                    seed=0,
+                )
+                dispatcher = PushDispatcher(
+                    transport=transport,
+                    batch_size=options["batch_size"],
+                    workers=workers,
+                    backoff=0,
+                )
+                dispatcher.enqueue_many(messages)
+                started = time.perf_counter()
+                with record_queries() as queries:
+                    delivered, failed = dispatcher.flush()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{workers:>8}{delivered:>12}{failed:>10}"
+                    f"{transport.batches:>8}{len(queries):>10}"
+                    f"{elapsed:>9.2f}{delivered / elapsed:>11.0f}"
+                )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from payments.tasks import rebuild_spending_ledgers
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводки расходов и кешбэка пользователей."
+
+    def handle(self, *args, **options):
+        updated = rebuild_spending_ledgers()
+        self.stdout.write(
+            self.style.SUCCESS(f"Обновлено сводок: {updated}")
+        )
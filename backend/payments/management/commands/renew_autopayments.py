@@ -0,0 +1,60 @@
+import datetime
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+
+from payments.bank import SimulatedBank
+from payments.push import PushDispatcher
+from payments.tasks import RENEWAL_CHUNK_SIZE, renew_autopayments
+
+
+class Command(BaseCommand):
+    help = (
+        "Списывает оплату по подпискам с автоплатежом, срок оплаты "
+        "которых наступил. Можно запускать в нескольких процессах."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            help="Дата, на которую ищутся платежи, ГГГГ-ММ-ДД.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=RENEWAL_CHUNK_SIZE
+        )
+        parser.add_argument(
+            "--decline-rate",
+            type=float,
+            default=0.0,
+            help="Доля списаний, отклоняемых заглушкой банка.",
+        )
+
+    def handle(self, *args, **options):
+        bank = SimulatedBank(decline_rate=options["decline_rate"])
+        dispatcher = PushDispatcher()
+        started = time.perf_counter()
+        renewed, declined = renew_autopayments(
+            today=options["date"],
+            chunk_size=options["chunk_size"],
+            bank=bank,
+            dispatcher=dispatcher,
+        )
+        elapsed = time.perf_counter() - started
+        try:
+            delivered, failed = dispatcher.flush()
+        except ImproperlyConfigured as error:
+            # списания уже проведены, ошибка настройки касается
+            # только уведомлений
+            self.stderr.write(f"Уведомления не отправлены: {error}")
+            delivered = failed = 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Продлено подписок: {renewed}, отклонено банком: "
+                f"{declined}, за {elapsed:.2f} с "
+                f"({renewed / elapsed if elapsed else 0:.0f} в секунду). "
+                f"Уведомлений доставлено: {delivered}, не доставлено: "
+                f"{failed}"
+            )
+        )
@@ -0,0 +1,40 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.push import PushDispatcher, expiry_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправляет напоминания об окончании подписок без автоплатежа. "
+        "Запускается раз в день."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            help="Дата, от которой считаются дни до окончания, ГГГГ-ММ-ДД.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="За сколько дней до окончания напоминать.",
+        )
+
+    def handle(self, *args, **options):
+        today = options["date"] or timezone.localdate()
+        dispatcher = PushDispatcher()
+        started = time.perf_counter()
+        dispatcher.enqueue_many(expiry_messages(today, options["days"]))
+        delivered, failed = dispatcher.flush()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Уведомлений доставлено: {delivered}, не доставлено: "
+                f"{failed}, за {elapsed:.2f} с"
+            )
+        )
@@ -0,0 +1,81 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_spending_ledgers(apps, schema_editor):
+    """Создает сводки пользователей с платежами по уже сохраненным данным."""
+    Payment = apps.get_model('payments', 'Payment')
+    Cashback = apps.get_model('payments', 'Cashback')
+    SpendingLedger = apps.get_model('payments', 'SpendingLedger')
+    alias = schema_editor.connection.alias
+    user_ids = (
+        Payment.objects.using(alias)
+        .order_by()
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    SpendingLedger.objects.using(alias).bulk_create(
+        [SpendingLedger(user_id=user_id) for user_id in user_ids],
+        batch_size=1000,
+    )
+    payments = (
+        Payment.objects.using(alias)
+        .filter(user=OuterRef('user'))
+        .order_by()
+        .values('user')
+    )
+    cashbacks = (
+        Cashback.objects.using(alias)
+        .filter(payment__user=OuterRef('user'))
+        .order_by()
+        .values('payment__user')
+    )
+    SpendingLedger.objects.using(alias).update(
+        total_spent=Coalesce(
+            Subquery(payments.annotate(spent=Sum('total')).values('spent')),
+            0,
+        ),
+        payments_count=Coalesce(
+            Subquery(payments.annotate(count=Count('id')).values('count')),
+            0,
+        ),
+        total_cashback=Coalesce(
+            Subquery(
+                cashbacks.annotate(amount=Sum('amount')).values('amount'),
+                output_field=models.DecimalField(),
+            ),
+            0,
+            output_field=models.DecimalField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('payments', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingLedger',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='spending_ledger', serialize=False, to='users.customuser', verbose_name='Пользователь')),
+                ('total_spent', models.PositiveBigIntegerField(default=0, verbose_name='Всего потрачено')),
+                ('total_cashback', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Всего кешбэка')),
+                ('payments_count', models.PositiveIntegerField(default=0, verbose_name='Количество платежей')),
+            ],
+            options={
+                'verbose_name': 'Сводка расходов',
+                'verbose_name_plural': 'Сводки расходов',
+            },
+        ),
+        migrations.RunPython(
+            fill_spending_ledgers, migrations.RunPython.noop
+        ),
+    ]
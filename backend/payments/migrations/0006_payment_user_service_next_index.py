@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_payment_user_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'service', 'next_payment_date'], name='payment_user_service_next_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from decimal import ROUND_DOWN, Decimal
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 from services.models import Service, Subscription
 
@@ -10,7 +12,15 @@ CALLBACK_CHOICES = (
     ("denied", "Отклонен"),
 )
 
-DISCOUNT = 0.8
+DISCOUNT = Decimal("0.8")
+# Множитель цены за месяц по длительности: скидка DISCOUNT за каждые
+# три месяца, для годовой подписки - за каждые четыре.
+DURATION_DISCOUNTS = {
+    1: Decimal(1),
+    3: DISCOUNT,
+    6: DISCOUNT ** 2,
+    12: DISCOUNT ** 3,
+}
 
 DURATION_CHOICES = (
     (1, '1 месяц'),
@@ -70,11 +80,8 @@ class TariffKind(models.Model):
     def calculate_cost_per_month(self, duration):
         """Вычисляет цену за месяц в завис. от длительности подписки."""
 
-        if duration == 1:
-            return self.cost_per_month
-        elif duration == 12:
-            return int(self.cost_per_month * DISCOUNT ** (duration / 4))
-        return int(self.cost_per_month * DISCOUNT ** (duration / 3))
+        cost = self.cost_per_month * DURATION_DISCOUNTS[duration]
+        return int(cost.to_integral_value(rounding=ROUND_DOWN))
 
     def save(self, *args, **kwargs):
         """Сохраняет итоговые значения в завсисмости
@@ -143,10 +150,21 @@ class Payment(models.Model):
         ordering = ["-payment_date"]
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
+        indexes = [
+            models.Index(
+                fields=["user", "-payment_date"],
+                name="payment_user_date_idx",
+            ),
+            models.Index(
+                fields=["user", "service", "next_payment_date"],
+                name="payment_user_service_next_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         self.total = self.tariff_kind.cost_total
-        super(Payment, self).save(*args, **kwargs)
+        with transaction.atomic():
+            super(Payment, self).save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.service} - {self.total}"
@@ -170,3 +188,44 @@ class Cashback(models.Model):
     class Meta:
         verbose_name = "Кешбэк"
         verbose_name_plural = "Кешбэк"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super(Cashback, self).save(*args, **kwargs)
+
+
+class SpendingLedger(models.Model):
+    """Сводка расходов и кешбэка пользователя.
+
+    Обновляется вместе с записью платежей и кешбэка,
+    чтобы главная страница читала итоги одним запросом по ключу.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Пользователь",
+        related_name="spending_ledger",
+    )
+    total_spent = models.PositiveBigIntegerField(
+        "Всего потрачено",
+        default=0,
+    )
+    total_cashback = models.DecimalField(
+        "Всего кешбэка",
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    payments_count = models.PositiveIntegerField(
+        "Количество платежей",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "Сводка расходов"
+        verbose_name_plural = "Сводки расходов"
+
+    def __str__(self):
+        return f"{self.user} - {self.total_spent}"
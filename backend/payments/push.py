@@ -1,12 +1,281 @@
-from push_notifications.models import APNSDevice
+"""Пуш-уведомления о списаниях и окончании подписок.
 
+Уведомления копятся в очереди диспетчера, устройства получателей
+находятся одним запросом на пачку, а отправка идет пачками в пуле
+потоков с повторами и растущей паузой между попытками.
+"""
+import datetime
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
 
-def send_push_notification(device_id, message):
-    """Заготовка для пуш-уведомлений."""
-    device = APNSDevice.objects.get(device_id=device_id)
-    device.send_message(message, badge=1)
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
 
+from services.models import Subscription
 
-device_id = "номер телефона"
-message = "ваша подписка на ___ истекает такогото числа"
-send_push_notification(device_id, message)
+logger = logging.getLogger(__name__)
+
+PushMessage = namedtuple("PushMessage", "user_id text")
+# Сообщение, адресованное конкретному устройству.
+PushDelivery = namedtuple(
+    "PushDelivery", "registration_id application_id text"
+)
+
+RESOLVE_CHUNK_SIZE = 1000
+
+
+class PushTransportError(Exception):
+    """Временная ошибка доставки, пачку можно отправить повторно.
+
+    ImproperlyConfigured транспорта, наоборот, не повторяется, а
+    прерывает отправку.
+    """
+
+
+def _message_group(delivery):
+    return delivery.application_id or "", delivery.text
+
+
+class APNSTransport:
+    """Отправка через APNs средствами django-push-notifications.
+
+    Одинаковые сообщения для одного приложения уходят одним вызовом.
+    Устройства, отозванные APNs, библиотека отключает сама. Без
+    пакета apns2 или сертификата APNS_CERTIFICATE транспорт не
+    создается.
+    """
+
+    def __init__(self):
+        try:
+            from push_notifications.apns import apns_send_bulk_message
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                "Для отправки через APNs нужен пакет apns2."
+            ) from error
+        if not settings.PUSH_NOTIFICATIONS_SETTINGS.get("APNS_CERTIFICATE"):
+            raise ImproperlyConfigured(
+                "Для отправки через APNs нужен сертификат APNS_CERTIFICATE."
+            )
+        self.send_bulk = apns_send_bulk_message
+
+    def send(self, deliveries):
+        """Отправляет пачку, возвращает недоставленные сообщения."""
+        failed = []
+        for (application_id, text), group in groupby(
+            sorted(deliveries, key=_message_group), key=_message_group
+        ):
+            group = list(group)
+            results = self.send_bulk(
+                registration_ids=[
+                    delivery.registration_id for delivery in group
+                ],
+                alert=text,
+                application_id=application_id or None,
+            )
+            failed += [
+                delivery
+                for delivery in group
+                if results.get(delivery.registration_id)
+                not in ("Success", "Unregistered")
+            ]
+        return failed
+
+
+class FakeTransport:
+    """Локальный транспорт для проверок и замеров.
+
+    Запоминает доставленные сообщения. failure_rate - доля сообщений,
+    которые не доставляются с первой попытки, latency - задержка
+    отправки пачки в секундах.
+    """
+
+    def __init__(self, failure_rate=0.0, latency=0.0, seed=None):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.delivered = []
+        self.batches = 0
+
+    def send(self, deliveries):
+        if self.latency:
+            time.sleep(self.latency)
+        failed = []
+        with self._lock:
+            self.batches += 1
+            for delivery in deliveries:
+                if self._random.random() < self.failure_rate:
+                    failed.append(delivery)
+                else:
+                    self.delivered.append(delivery)
+        return failed
+
+
+class LoggingTransport:
+    """Транспорт для окружений без настроенных пуш-уведомлений.
+
+    Сообщения не отправляются, в журнал пишется только их число.
+    """
+
+    def send(self, deliveries):
+        logger.info(
+            "Пуш-уведомления не настроены, пропущено: %s", len(deliveries)
+        )
+        return []
+
+
+def get_transport():
+    """Транспорт из PUSH_TRANSPORT.
+
+    Без PUSH_TRANSPORT сообщения уходят через APNs, если задан
+    сертификат APNS_CERTIFICATE, иначе только пишутся в журнал.
+    """
+    path = settings.PUSH_TRANSPORT
+    if not path:
+        path = "payments.push.LoggingTransport"
+        if settings.PUSH_NOTIFICATIONS_SETTINGS.get("APNS_CERTIFICATE"):
+            path = "payments.push.APNSTransport"
+    return import_string(path)()
+
+
+class PushDispatcher:
+    """Очередь пуш-уведомлений с пакетной отправкой.
+
+    enqueue только складывает сообщение в очередь, отправляет всё
+    накопленное flush. Недоставленная часть пачки отправляется снова
+    до max_attempts раз с паузой backoff * 2 ** (попытка - 1) секунд.
+    Транспорт создается при первой отправке, поэтому диспетчер можно
+    завести и без настроенных уведомлений. Ошибка настройки
+    транспорта сразу прерывает flush.
+    """
+
+    def __init__(
+        self,
+        transport=None,
+        batch_size=None,
+        workers=None,
+        max_attempts=None,
+        backoff=None,
+    ):
+        self.transport = transport
+        self.batch_size = batch_size or settings.PUSH_BATCH_SIZE
+        self.workers = workers or settings.PUSH_WORKERS
+        self.max_attempts = max_attempts or settings.PUSH_MAX_ATTEMPTS
+        self.backoff = settings.PUSH_BACKOFF if backoff is None else backoff
+        self._lock = threading.Lock()
+        self._queue = []
+
+    def enqueue(self, user_id, text):
+        with self._lock:
+            self._queue.append(PushMessage(user_id, text))
+
+    def enqueue_many(self, messages):
+        with self._lock:
+            self._queue.extend(messages)
+
+    def resolve_devices(self, messages):
+        """Адресует сообщения всем активным устройствам получателей.
+
+        Устройства запрашиваются одним запросом на RESOLVE_CHUNK_SIZE
+        получателей.
+        """
+        from push_notifications.models import APNSDevice
+
+        deliveries = []
+        for start in range(0, len(messages), RESOLVE_CHUNK_SIZE):
+            chunk = messages[start:start + RESOLVE_CHUNK_SIZE]
+            devices = {}
+            rows = APNSDevice.objects.filter(
+                user_id__in={message.user_id for message in chunk},
+                active=True,
+            ).values_list("user_id", "registration_id", "application_id")
+            for user_id, registration_id, application_id in rows:
+                devices.setdefault(user_id, []).append(
+                    (registration_id, application_id)
+                )
+            for message in chunk:
+                for registration_id, application_id in devices.get(
+                    message.user_id, ()
+                ):
+                    deliveries.append(
+                        PushDelivery(
+                            registration_id, application_id, message.text
+                        )
+                    )
+        return deliveries
+
+    def flush(self):
+        """Отправляет накопленные сообщения.
+
+        Возвращает число доставленных и недоставленных сообщений.
+        """
+        with self._lock:
+            messages, self._queue = self._queue, []
+        if not messages:
+            return 0, 0
+        if self.transport is None:
+            self.transport = get_transport()
+        deliveries = self.resolve_devices(messages)
+        batches = [
+            deliveries[start:start + self.batch_size]
+            for start in range(0, len(deliveries), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            failed = sum(executor.map(self._send_batch, batches))
+        return len(deliveries) - failed, failed
+
+    def _send_batch(self, batch):
+        """Отправляет пачку с повторами, возвращает число потерянных."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                batch = self.transport.send(batch)
+            except ImproperlyConfigured:
+                raise
+            except PushTransportError:
+                logger.warning("Ошибка отправки пачки пуш-уведомлений")
+            except Exception:
+                logger.exception("Сбой отправки пачки пуш-уведомлений")
+            if not batch:
+                return 0
+            if attempt < self.max_attempts and self.backoff:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        logger.error("Не доставлено пуш-уведомлений: %s", len(batch))
+        return len(batch)
+
+
+def payment_message(payment, service_name):
+    return PushMessage(
+        payment.user_id,
+        f"Оплачена подписка на {service_name}: {payment.total} ₽. "
+        f"Следующий платеж {payment.next_payment_date:%d.%m.%Y}.",
+    )
+
+
+def expiry_messages(today, days=None):
+    """Напоминания об окончании подписок без автоплатежа.
+
+    Напоминание уходит один раз, когда до даты следующего платежа
+    остается days дней.
+    """
+    if days is None:
+        days = settings.PUSH_EXPIRY_NOTICE_DAYS
+    expiry_date = today + datetime.timedelta(days=days)
+    subscriptions = Subscription.objects.filter(
+        activation_status=1,
+        autopayment=False,
+        next_payment_date=expiry_date,
+    ).values_list("user_id", "service__name")
+    return [
+        PushMessage(
+            user_id,
+            f"Ваша подписка на {service_name} истекает "
+            f"{expiry_date:%d.%m.%Y}.",
+        )
+        for user_id, service_name in subscriptions
+    ]
@@ -0,0 +1,126 @@
+"""Обработчики сигналов моделей приложения payments."""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from services.cache import bump_version
+from services.models import Subscription
+from .models import Cashback, Payment, SpendingLedger, TariffKind
+
+
+def _shift_ledger(user_id, spent=0, cashback=0, count=0):
+    """Атомарно сдвигает итоги пользователя, создавая сводку при нужде."""
+    values = {
+        "total_spent": F("total_spent") + spent,
+        "total_cashback": F("total_cashback") + cashback,
+        "payments_count": F("payments_count") + count,
+    }
+    if not SpendingLedger.objects.filter(pk=user_id).update(**values):
+        SpendingLedger.objects.get_or_create(user_id=user_id)
+        SpendingLedger.objects.filter(pk=user_id).update(**values)
+
+
+@receiver(pre_save, sender=Payment)
+def remember_previous_payment(sender, instance, **kwargs):
+    # Payment.save идет в транзакции, строка заблокирована до ее конца,
+    # и параллельное изменение сдвинет сводку уже от нового значения
+    instance._previous_payment = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_payment = (
+            Payment.objects.select_for_update()
+            .filter(pk=instance.pk)
+            .values_list("user_id", "total")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+def update_ledger_on_payment(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_payment", None)
+    if previous is not None:
+        previous_user_id, previous_total = previous
+        if previous_user_id == instance.user_id:
+            if previous_total != instance.total:
+                _shift_ledger(
+                    instance.user_id, spent=instance.total - previous_total
+                )
+            return
+        _shift_ledger(previous_user_id, spent=-previous_total, count=-1)
+    _shift_ledger(instance.user_id, spent=instance.total, count=1)
+
+
+@receiver(post_save, sender=Payment)
+def sync_subscription_next_payment(sender, instance, created, **kwargs):
+    """Новая оплата переносит дату следующего платежа в подписку."""
+    if created:
+        Subscription.objects.filter(pk=instance.subscription_id).update(
+            next_payment_date=instance.next_payment_date
+        )
+
+
+@receiver(post_save, sender=Payment)
+def enqueue_payment_jobs(sender, instance, created, **kwargs):
+    """Начисление кешбэка и уведомление о платеже уходят в очередь."""
+    if created:
+        enqueue("payments.accrue_cashback", payment_id=instance.pk)
+        enqueue("payments.notify_payment", payment_id=instance.pk)
+
+
+@receiver(post_delete, sender=Payment)
+def update_ledger_on_payment_delete(sender, instance, **kwargs):
+    _shift_ledger(instance.user_id, spent=-instance.total, count=-1)
+
+
+@receiver(pre_save, sender=Cashback)
+def remember_previous_cashback(sender, instance, **kwargs):
+    # как и у платежа, блокируется только строка кешбэка
+    instance._previous_cashback = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_cashback = (
+            Cashback.objects.select_for_update(of=("self",))
+            .filter(pk=instance.pk)
+            .values_list("payment__user_id", "amount")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Cashback)
+def update_ledger_on_cashback(sender, instance, created, **kwargs):
+    user_id = instance.payment.user_id
+    amount = Decimal(instance.amount)
+    previous = getattr(instance, "_previous_cashback", None)
+    if previous is not None:
+        previous_user_id, previous_amount = previous
+        if previous_user_id == user_id:
+            if previous_amount != amount:
+                _shift_ledger(user_id, cashback=amount - previous_amount)
+            return
+        _shift_ledger(previous_user_id, cashback=-previous_amount)
+    _shift_ledger(user_id, cashback=amount)
+
+
+@receiver(post_delete, sender=Cashback)
+def update_ledger_on_cashback_delete(sender, instance, **kwargs):
+    user_id = (
+        Payment.objects.filter(pk=instance.payment_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    if user_id is not None:
+        _shift_ledger(user_id, cashback=-Decimal(instance.amount))
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Cashback)
+@receiver(post_delete, sender=Cashback)
+@receiver(post_save, sender=TariffKind)
+@receiver(post_delete, sender=TariffKind)
+def invalidate_cache(sender, **kwargs):
+    # до фиксации транзакции читатель, не нашедший данных в кэше,
+    # сохранил бы под новой версией еще прежние строки
+    transaction.on_commit(lambda: bump_version(sender))
@@ -0,0 +1,346 @@
+"""Фоновые пересчеты и списания по платежам."""
+import calendar
+import datetime
+import uuid
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connection, models, transaction
+from django.db.models import (Case, Count, F, Max, OuterRef, Q, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from services.cache import bump_version
+from services.models import Subscription
+from .bank import SimulatedBank
+from .models import Cashback, Payment, SpendingLedger
+from .push import payment_message
+
+LEDGER_BATCH_SIZE = 1000
+CASHBACK_CHUNK_SIZE = 2000
+CENTS = Decimal("0.01")
+RENEWAL_CHUNK_SIZE = 500
+# Через сколько подписка, взятая упавшим обработчиком, снова доступна.
+RENEWAL_CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+def rebuild_spending_ledgers(user_ids=None):
+    """Пересчитывает сводки расходов пользователей с платежами.
+
+    Без user_ids пересчитываются все сводки. Недостающие сводки
+    создаются пачками, после чего итоги обновляются одним запросом
+    с подзапросами к платежам и кешбэку.
+    Возвращает количество обновленных сводок.
+    """
+    if user_ids is None:
+        user_ids = (
+            Payment.objects.order_by()
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        ledgers = SpendingLedger.objects.all()
+    else:
+        ledgers = SpendingLedger.objects.filter(pk__in=user_ids)
+    payments = Payment.objects.filter(user=OuterRef("user"))
+    payments = payments.order_by().values("user")
+    cashbacks = Cashback.objects.filter(payment__user=OuterRef("user"))
+    cashbacks = cashbacks.order_by().values("payment__user")
+    spent = payments.annotate(spent=Sum("total")).values("spent")
+    count = payments.annotate(count=Count("id")).values("count")
+    cashback = cashbacks.annotate(amount=Sum("amount")).values("amount")
+    with transaction.atomic():
+        SpendingLedger.objects.bulk_create(
+            [SpendingLedger(user_id=user_id) for user_id in user_ids],
+            batch_size=LEDGER_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        updated = ledgers.update(
+            total_spent=Coalesce(Subquery(spent), 0),
+            payments_count=Coalesce(Subquery(count), 0),
+            total_cashback=Coalesce(
+                Subquery(cashback, output_field=models.DecimalField()),
+                0,
+                output_field=models.DecimalField(),
+            ),
+        )
+    bump_version(SpendingLedger)
+    return updated
+
+
+def calculate_cashback(total, percentage):
+    """Кешбэк с суммы платежа в рублях с копейками, без float."""
+    amount = Decimal(total) * Decimal(percentage) / 100
+    return amount.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def accrue_cashbacks(
+    payment_ids=None, after_pk=None, chunk_size=CASHBACK_CHUNK_SIZE
+):
+    """Начисляет кешбэк за принятые банком платежи без кешбэка.
+
+    Платежи перебираются пачками по возрастанию ключа. Пачка
+    блокируется на время вставки (там, где база это умеет, с SKIP
+    LOCKED), кешбэк вставляется bulk_create с пропуском уже
+    существующих строк, поэтому повторный или параллельный запуск
+    не начислит кешбэк дважды. Сводки пользователей пачки
+    пересчитываются одним запросом, а не сдвигаются на суммы: такой
+    пересчет верен и после параллельного запуска и быстрее CASE
+    на тысячи пользователей.
+    payment_ids ограничивает обработку указанными платежами,
+    after_pk - платежами с ключом больше заданного.
+    Возвращает число обработанных платежей.
+    """
+    pending = Payment.objects.filter(
+        callback="accepted", cashbacks__isnull=True
+    )
+    if payment_ids is not None:
+        pending = pending.filter(pk__in=payment_ids)
+    last_pk = after_pk or 0
+    accrued = 0
+    while True:
+        with transaction.atomic():
+            chunk = pending.filter(pk__gt=last_pk).order_by("pk")
+            if connection.features.has_select_for_update_skip_locked:
+                chunk = chunk.select_for_update(skip_locked=True, of=("self",))
+            rows = list(
+                chunk.values_list(
+                    "pk", "user_id", "total", "service__cashback_percentage"
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            Cashback.objects.bulk_create(
+                [
+                    Cashback(
+                        payment_id=pk,
+                        amount=calculate_cashback(total, percentage),
+                    )
+                    for pk, _, total, percentage in rows
+                ],
+                batch_size=LEDGER_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            rebuild_spending_ledgers({user_id for _, user_id, _, _ in rows})
+        accrued += len(rows)
+    if accrued:
+        bump_version(Cashback)
+    return accrued
+
+
+def shift_spending_ledgers(changes):
+    """Сдвигает итоги нескольких пользователей одним запросом.
+
+    changes - словарь: пользователь - пара (потрачено, число платежей).
+    """
+    if not changes:
+        return
+    SpendingLedger.objects.bulk_create(
+        [SpendingLedger(user_id=user_id) for user_id in changes],
+        batch_size=LEDGER_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    spent = Case(
+        *[
+            When(pk=user_id, then=Value(value))
+            for user_id, (value, _) in changes.items()
+        ],
+        default=Value(0),
+        output_field=models.PositiveBigIntegerField(),
+    )
+    count = Case(
+        *[
+            When(pk=user_id, then=Value(value))
+            for user_id, (_, value) in changes.items()
+        ],
+        default=Value(0),
+        output_field=models.PositiveIntegerField(),
+    )
+    SpendingLedger.objects.filter(pk__in=changes).update(
+        total_spent=F("total_spent") + spent,
+        payments_count=F("payments_count") + count,
+    )
+
+
+def add_months(date, months):
+    """Сдвигает дату на несколько месяцев, прижимая день к концу месяца."""
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+
+def _due_subscriptions(today):
+    return Subscription.objects.filter(
+        autopayment=True,
+        activation_status=1,
+        next_payment_date__lte=today,
+    )
+
+
+def claim_due_subscriptions(today, chunk_size, now=None, since=None):
+    """Забирает в работу пачку подписок, по которым пора списывать.
+
+    Подписка помечается меткой обработчика условным UPDATE, который
+    заново проверяет, что ее никто не взял, поэтому одна подписка
+    достается только одному из параллельных обработчиков. Там, где
+    база это умеет, кандидаты выбираются с SKIP LOCKED, чтобы
+    обработчики не ждали друг друга. С since не берутся подписки,
+    взятые в работу начиная с этого момента. Возвращает метку и подписки.
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4()
+    unclaimed = Q(renewal_token__isnull=True) | Q(
+        renewal_claimed_at__lt=now - RENEWAL_CLAIM_TIMEOUT
+    )
+    with transaction.atomic():
+        candidates = _due_subscriptions(today).filter(unclaimed)
+        if since is not None:
+            candidates = candidates.exclude(renewal_claimed_at__gte=since)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(
+            candidates.order_by("next_payment_date").values_list(
+                "pk", flat=True
+            )[:chunk_size]
+        )
+        if not ids:
+            return token, []
+        _due_subscriptions(today).filter(unclaimed, pk__in=ids).update(
+            renewal_token=token, renewal_claimed_at=now
+        )
+    return token, list(
+        Subscription.objects.filter(
+            pk__in=ids, renewal_token=token
+        ).select_related("service")
+    )
+
+
+def _charge_subscriptions(token, subscriptions, bank, dispatcher=None):
+    """Списывает оплату по взятым подпискам и записывает платежи.
+
+    Тариф и сумма берутся из последней оплаты подписки. Ключ
+    идемпотентности списания - подписка и оплачиваемая дата, так что
+    повтор после падения обработчика не спишет деньги дважды.
+    Отклоненные банком подписки и подписки без оплат остаются
+    помеченными и снова берутся в работу по истечении
+    RENEWAL_CLAIM_TIMEOUT, то есть при следующем запуске.
+    Возвращает число принятых и отклоненных списаний.
+    """
+    latest = {}
+    payments = (
+        Payment.objects.filter(subscription__in=subscriptions)
+        .select_related("tariff_kind")
+        .order_by("subscription_id", "-payment_date")
+    )
+    for payment in payments:
+        latest.setdefault(payment.subscription_id, payment)
+    charges = {
+        f"{subscription.pk}:{subscription.next_payment_date}": subscription
+        for subscription in subscriptions
+        if subscription.pk in latest
+    }
+    results = bank.charge_batch(
+        [
+            (key, latest[subscription.pk].tariff_kind.cost_total)
+            for key, subscription in charges.items()
+        ]
+    )
+    renewed = {}
+    for key, subscription in charges.items():
+        if results[key]:
+            renewed[subscription.pk] = (
+                subscription,
+                latest[subscription.pk].tariff_kind,
+            )
+    with transaction.atomic():
+        # подписку могли отдать другому обработчику, если этот завис
+        # дольше RENEWAL_CLAIM_TIMEOUT: платеж пишет только ее владелец
+        owned = Subscription.objects.filter(
+            renewal_token=token, pk__in=renewed
+        )
+        if connection.features.has_select_for_update:
+            owned = owned.select_for_update()
+        owned = set(owned.values_list("pk", flat=True))
+        new_payments = []
+        ledger_changes = {}
+        subscriptions = []
+        for pk in owned:
+            subscription, tariff = renewed[pk]
+            subscription.next_payment_date = add_months(
+                subscription.next_payment_date, tariff.duration
+            )
+            # время взятия остается: по нему запуск не продлевает
+            # подписку второй раз
+            subscription.renewal_token = None
+            subscriptions.append(subscription)
+            new_payments.append(
+                Payment(
+                    user_id=subscription.user_id,
+                    service_id=subscription.service_id,
+                    subscription=subscription,
+                    tariff_kind=tariff,
+                    total=tariff.cost_total,
+                    accept_rules=True,
+                    callback="accepted",
+                    next_payment_date=subscription.next_payment_date,
+                    next_payment_amount=tariff.cost_total,
+                )
+            )
+            spent, count = ledger_changes.get(subscription.user_id, (0, 0))
+            ledger_changes[subscription.user_id] = (
+                spent + tariff.cost_total,
+                count + 1,
+            )
+        Payment.objects.bulk_create(new_payments, batch_size=LEDGER_BATCH_SIZE)
+        Subscription.objects.bulk_update(
+            subscriptions,
+            ["next_payment_date", "renewal_token"],
+            batch_size=LEDGER_BATCH_SIZE,
+        )
+        shift_spending_ledgers(ledger_changes)
+    if dispatcher is not None:
+        dispatcher.enqueue_many(
+            payment_message(payment, payment.subscription.service.name)
+            for payment in new_payments
+        )
+    return len(new_payments), len(charges) - len(renewed)
+
+
+def renew_autopayments(
+    today=None, chunk_size=RENEWAL_CHUNK_SIZE, bank=None, dispatcher=None
+):
+    """Продлевает подписки с автоплатежом, срок оплаты которых наступил.
+
+    Подписки забираются пачками по chunk_size, поэтому команду можно
+    запускать в нескольких процессах одновременно. Каждая подписка
+    продлевается не больше чем на один период за запуск.
+    Уведомления о списаниях складываются в очередь dispatcher,
+    за новые платежи начисляется кешбэк.
+    Возвращает число продленных подписок и отклоненных списаний.
+    """
+    today = today or timezone.localdate()
+    bank = bank or SimulatedBank()
+    started = timezone.now()
+    last_pk = Payment.objects.aggregate(last=Max("pk"))["last"]
+    renewed = declined = 0
+    # продленная подписка снимает метку и, если оплата все еще
+    # просрочена, снова попадает в выборку: до конца запуска взятые
+    # после его начала подписки исключаются
+    while True:
+        token, subscriptions = claim_due_subscriptions(
+            today, chunk_size, since=started
+        )
+        if not subscriptions:
+            break
+        accepted, rejected = _charge_subscriptions(
+            token, subscriptions, bank, dispatcher
+        )
+        renewed += accepted
+        declined += rejected
+    if renewed:
+        for model in (Payment, Subscription, SpendingLedger):
+            bump_version(model)
+        accrue_cashbacks(after_pk=last_pk)
+    return renewed, declined
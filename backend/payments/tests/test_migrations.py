@@ -0,0 +1,58 @@
+import datetime
+from decimal import Decimal
+
+from payments.models import Payment, SpendingLedger
+
+# сервисы - до счетчиков оценок, чтобы исторические модели совпали с базой
+BEFORE_LEDGER = (("payments", "0003_initial"), ("services", "0002_initial"))
+LEDGER = (("payments", "0004_spending_ledger"), ("services", "0002_initial"))
+
+
+def test_spending_ledgers_are_filled_for_existing_payments(migrate):
+    apps = migrate(*BEFORE_LEDGER)
+    user = apps.get_model("users", "CustomUser").objects.create(
+        username="payer", email="payer@pay2u.ru", phone_number="+79000000001"
+    )
+    service = apps.get_model("services", "Service").objects.create(
+        name="Кино",
+        text="-",
+        cost=100,
+        cashback_percentage=5,
+        partners_link="https://example.com",
+    )
+    subscription = apps.get_model("services", "Subscription").objects.create(
+        user=user, service=service, activation_status=1
+    )
+    tariff = apps.get_model("payments", "TariffKind").objects.create(
+        service=service, duration=1
+    )
+    for total, cashback in ((300, Decimal("15.00")), (200, None)):
+        payment = apps.get_model("payments", "Payment").objects.create(
+            user=user,
+            service=service,
+            subscription=subscription,
+            tariff_kind=tariff,
+            total=total,
+            callback="accepted",
+            next_payment_date=datetime.date.today(),
+            next_payment_amount=total,
+        )
+        if cashback is not None:
+            apps.get_model("payments", "Cashback").objects.create(
+                payment=payment, amount=cashback
+            )
+
+    apps = migrate(*LEDGER)
+    ledger = apps.get_model("payments", "SpendingLedger").objects.get()
+    assert ledger.user_id == user.pk
+    assert (
+        ledger.total_spent, ledger.total_cashback, ledger.payments_count
+    ) == (500, Decimal("15.00"), 2)
+
+    # удаление платежа, сделанного до миграции, не уводит сводку в минус
+    migrate()
+    Payment.objects.filter(total=300).delete()
+    ledger = SpendingLedger.objects.get()
+    assert (
+        ledger.total_spent, ledger.total_cashback, ledger.payments_count
+    ) == (200, Decimal("0.00"), 1)
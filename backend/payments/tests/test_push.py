@@ -0,0 +1,73 @@
+import datetime
+import io
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.utils import timezone
+
+from payments.jobs import notify_payment
+from payments.models import Payment
+from payments.push import (APNSTransport, LoggingTransport, PushDelivery,
+                           PushDispatcher, PushMessage, get_transport)
+from services.models import Subscription
+from services.seed import seed_dataset
+
+DELIVERY = PushDelivery("token", None, "text")
+
+
+class BrokenTransport:
+    calls = 0
+
+    def send(self, deliveries):
+        self.calls += 1
+        raise ImproperlyConfigured("no certificate")
+
+
+def test_configuration_error_is_not_retried():
+    transport = BrokenTransport()
+    dispatcher = PushDispatcher(transport=transport, max_attempts=3, backoff=0)
+    with pytest.raises(ImproperlyConfigured):
+        dispatcher._send_batch([DELIVERY])
+    assert transport.calls == 1
+
+
+def test_apns_transport_requires_certificate(settings):
+    settings.PUSH_NOTIFICATIONS_SETTINGS = {"APNS_CERTIFICATE": ""}
+    with pytest.raises(ImproperlyConfigured):
+        APNSTransport()
+
+
+@pytest.fixture
+def no_push(settings):
+    settings.PUSH_TRANSPORT = ""
+    settings.PUSH_NOTIFICATIONS_SETTINGS = {"APNS_CERTIFICATE": ""}
+
+
+def test_push_disabled_without_certificate(no_push):
+    assert isinstance(get_transport(), LoggingTransport)
+
+
+def test_transport_created_on_flush(no_push, settings):
+    settings.PUSH_TRANSPORT = "payments.push.APNSTransport"
+    dispatcher = PushDispatcher()
+    dispatcher.enqueue_many([PushMessage(1, "text")])
+    with pytest.raises(ImproperlyConfigured):
+        dispatcher.flush()
+
+
+def test_payment_notice_without_push(no_push, db):
+    seed_dataset(users=1, services=1, payments=1, seed=0)
+    notify_payment(Payment.objects.get().pk)
+
+
+def test_renewals_without_push(no_push, db):
+    seed_dataset(users=2, services=2, subscriptions=2, payments=1, seed=0)
+    Subscription.objects.update(autopayment=True, activation_status=1)
+    payments = Payment.objects.count()
+    call_command(
+        "renew_autopayments",
+        date=timezone.localdate() + datetime.timedelta(days=365),
+        stdout=io.StringIO(),
+    )
+    assert Payment.objects.count() > payments
@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.db.models.signals import pre_save
+
+from payments.models import Cashback, Payment, SpendingLedger
+from services.seed import seed_dataset
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("model", (Payment, Cashback))
+def test_previous_value_is_read_inside_save_transaction(model):
+    seed_dataset(users=1, services=1, payments=1, cashbacks=1, seed=0)
+    instance = model.objects.get()
+    atomic = []
+
+    def record(sender, instance, **kwargs):
+        atomic.append(connection.in_atomic_block)
+
+    pre_save.connect(record, sender=model)
+    try:
+        instance.save()
+    finally:
+        pre_save.disconnect(record, sender=model)
+
+    assert atomic == [True]
+
+
+@pytest.mark.django_db
+def test_cashback_update_shifts_ledger_by_difference():
+    seed_dataset(users=1, services=1, payments=1, cashbacks=1, seed=0)
+    cashback = Cashback.objects.select_related("payment").get()
+    cashback.amount = Decimal(cashback.amount) + Decimal("10.00")
+    cashback.save()
+    ledger = SpendingLedger.objects.get(pk=cashback.payment.user_id)
+    assert ledger.total_cashback == cashback.amount
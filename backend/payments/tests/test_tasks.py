@@ -0,0 +1,79 @@
+import datetime
+
+from django.utils import timezone
+
+from payments.models import Cashback, Payment, SpendingLedger
+from payments.tasks import (accrue_cashbacks, add_months, calculate_cashback,
+                            renew_autopayments)
+from services.models import Subscription
+from services.seed import seed_dataset
+
+
+def test_overdue_subscription_renewed_once_per_run(db):
+    seed_dataset(users=1, services=2, subscriptions=2, payments=1, seed=0)
+    today = timezone.localdate()
+    overdue = today - datetime.timedelta(days=100)
+    Subscription.objects.update(autopayment=False)
+    subscription = Subscription.objects.first()
+    Subscription.objects.filter(pk=subscription.pk).update(
+        autopayment=True, activation_status=1, next_payment_date=overdue
+    )
+    payments = Payment.objects.count()
+
+    assert renew_autopayments(today, chunk_size=1) == (1, 0)
+
+    subscription.refresh_from_db()
+    payment = Payment.objects.latest("pk")
+    assert Payment.objects.count() == payments + 1
+    assert subscription.next_payment_date == add_months(
+        overdue, payment.tariff_kind.duration
+    )
+
+
+def test_overdue_subscription_renewed_again_next_run(db):
+    seed_dataset(users=1, services=2, subscriptions=2, payments=1, seed=0)
+    today = timezone.localdate()
+    # просрочка длиннее любого тарифа: после одного периода оплата
+    # все еще просрочена
+    overdue = today - datetime.timedelta(days=3 * 366)
+    Subscription.objects.update(autopayment=False)
+    Subscription.objects.filter(pk=Subscription.objects.first().pk).update(
+        autopayment=True, activation_status=1, next_payment_date=overdue
+    )
+
+    assert renew_autopayments(today, chunk_size=1) == (1, 0)
+    assert renew_autopayments(today, chunk_size=1) == (1, 0)
+
+
+def test_repeated_cashback_accrual_counts_once(db):
+    seed_dataset(users=5, services=3, payments=40, cashbacks=0.5, seed=0)
+    pending = list(
+        Payment.objects.filter(callback="accepted", cashbacks__isnull=True)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    assert len(pending) > 2
+    middle = len(pending) // 2
+
+    accrue_cashbacks(payment_ids=pending[: middle + 1], chunk_size=3)
+    accrue_cashbacks(payment_ids=pending[middle - 1:], chunk_size=3)
+    accrue_cashbacks(payment_ids=pending)
+    assert accrue_cashbacks() == 0
+
+    accepted = Payment.objects.filter(callback="accepted").select_related(
+        "service"
+    )
+    cashbacks = dict(Cashback.objects.values_list("payment_id", "amount"))
+    assert cashbacks == {
+        payment.pk: calculate_cashback(
+            payment.total, payment.service.cashback_percentage
+        )
+        for payment in accepted
+    }
+    for ledger in SpendingLedger.objects.all():
+        payments = Payment.objects.filter(user=ledger.user_id)
+        assert ledger.total_spent == sum(p.total for p in payments)
+        assert ledger.payments_count == len(payments)
+        assert ledger.total_cashback == sum(
+            cashbacks.get(p.pk, 0) for p in payments
+        )
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from payments.models import Payment, TariffKind
-from .models import Category, Rating, Service, Subscription
+from .models import Category, PromoCode, Rating, Service, Subscription
 
 admin.site.empty_value_display = 'Не задано'
 admin.site.site_header = 'Администрирование проекта "Pay2u"'
@@ -88,6 +88,8 @@ class SubscriptionAdmin(admin.ModelAdmin):
         "user",
         "service",
         "activation_status",
+        "autopayment",
+        "next_payment_date",
     )
     list_filter = (
         "activation_status",
@@ -99,3 +101,14 @@ class SubscriptionAdmin(admin.ModelAdmin):
         "activation_statis",
     )
     list_editable = ("activation_status",)
+
+
+@admin.register(PromoCode)
+class PromoCodeAdmin(admin.ModelAdmin):
+    list_display = (
+        "code",
+        "subscription",
+        "allocated_at",
+    )
+    search_fields = ("code",)
+    raw_id_fields = ("subscription",)
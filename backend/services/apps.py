@@ -5,3 +5,6 @@ class ServicesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "services"
     verbose_name = "Сервисы"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
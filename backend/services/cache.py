@@ -0,0 +1,114 @@
+"""Версии моделей для ключей кэша и счетчики попаданий в кэш."""
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+MODEL_VERSION_KEY = "cache:version:{model}"
+
+# Версии, прочитанные за текущий запрос; вне запроса - None.
+_request_versions = contextvars.ContextVar("request_versions", default=None)
+# Ключи версий, которые процесс уже запрашивал.
+_known_keys = set()
+
+
+def version_cache():
+    return caches[settings.CACHE_VERSION_ALIAS]
+
+
+def _version_key(model):
+    return MODEL_VERSION_KEY.format(model=model._meta.label_lower)
+
+
+def _read_versions(keys):
+    cache = version_cache()
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), settings.CACHE_VERSION_TIMEOUT)
+        versions.update(cache.get_many(missing))
+    return {key: versions.get(key) or time.time_ns() for key in keys}
+
+
+def get_version_values(*models):
+    """Текущие версии моделей.
+
+    Версия - время последнего изменения модели в наносекундах.
+    Версия, вытесненная из кэша или истекшая через
+    CACHE_VERSION_TIMEOUT, заново берется от текущего времени, чтобы
+    не совпасть с ключами, сохраненными при прежних версиях.
+    В запросе версии читаются один раз вместе со всеми, которые процесс
+    уже запрашивал, и дальше берутся из памяти.
+    """
+    keys = [_version_key(model) for model in models]
+    memo = _request_versions.get()
+    if memo is None:
+        versions = _read_versions(keys)
+        return [versions[key] for key in keys]
+    _known_keys.update(keys)
+    if any(key not in memo for key in keys):
+        memo.update(_read_versions(sorted(_known_keys.difference(memo))))
+    return [memo[key] for key in keys]
+
+
+def get_versions(*models):
+    """Строка из текущих версий моделей для построения ключа кэша."""
+    return ".".join(str(version) for version in get_version_values(*models))
+
+
+def bump_version(model):
+    """Делает недействительными закэшированные данные, зависящие от модели."""
+    cache = version_cache()
+    key = _version_key(model)
+    version = max(time.time_ns(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, settings.CACHE_VERSION_TIMEOUT)
+    memo = _request_versions.get()
+    if memo is not None:
+        memo[key] = version
+
+
+def start_request_versions():
+    """Начинает запоминать версии до конца текущего запроса."""
+    _request_versions.set({})
+
+
+def finish_request_versions():
+    _request_versions.set(None)
+
+
+class CacheStats:
+    """Счетчики попаданий и промахов кэша в рамках процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _add(self, namespace, field):
+        with self._lock:
+            counters = self._counters.setdefault(
+                namespace, {"hits": 0, "misses": 0}
+            )
+            counters[field] += 1
+
+    def hit(self, namespace):
+        self._add(namespace, "hits")
+
+    def miss(self, namespace):
+        self._add(namespace, "misses")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                namespace: dict(counters)
+                for namespace, counters in self._counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+cache_stats = CacheStats()
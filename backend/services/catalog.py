@@ -0,0 +1,57 @@
+"""Кэшируемый каталог категорий."""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from .cache import cache_stats, get_versions
+from .models import Category, Service
+
+CATEGORY_CATALOG_KEY = "catalog:categories:{versions}"
+PUBLICATION_KEY = "catalog:publication:{versions}"
+
+
+def category_catalog_queryset():
+    """Категории с максимальным кэшбеком и количеством сервисов."""
+    return Category.objects.annotate(
+        max_cashback=Max("services__cashback_percentage"),
+        services_count=Count("services"),
+    )
+
+
+def get_category_catalog():
+    """Список категорий каталога из кэша или одним запросом к БД."""
+    key = CATEGORY_CATALOG_KEY.format(
+        versions=get_versions(Category, Service)
+    )
+    categories = cache.get(key)
+    if categories is None:
+        cache_stats.miss("catalog")
+        categories = list(category_catalog_queryset())
+        cache.set(key, categories, settings.CATALOG_CACHE_TIMEOUT)
+    else:
+        cache_stats.hit("catalog")
+    return categories
+
+
+def last_publication():
+    """Последняя наступившая дата публикации сервисов или None.
+
+    Сервис с pub_date в будущем появляется в выдаче, когда эта дата
+    наступает, а версии моделей при этом не меняются. Поэтому ключи
+    кэша и ETag выдач, отбирающих сервисы по pub_date, включают
+    последнюю наступившую дату публикации. Она хранится в кэше вместе
+    с ближайшей будущей датой до изменения сервисов или до
+    наступления этой будущей даты.
+    """
+    key = PUBLICATION_KEY.format(versions=get_versions(Service))
+    now = timezone.now()
+    dates = cache.get(key)
+    if dates is None or (dates[1] is not None and dates[1] <= now):
+        dates = Service.objects.aggregate(
+            published=Max("pub_date", filter=Q(pub_date__lte=now)),
+            pending=Min("pub_date", filter=Q(pub_date__gt=now)),
+        )
+        dates = (dates["published"], dates["pending"])
+        cache.set(key, dates, settings.CATALOG_CACHE_TIMEOUT)
+    return dates[0]
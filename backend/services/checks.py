@@ -0,0 +1,17 @@
+"""Проверки настроек для manage.py check --deploy."""
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register("monitoring", deploy=True)
+def check_sentry_dsn(app_configs, **kwargs):
+    """Без SENTRY_DSN ошибки production никуда не отправляются."""
+    if settings.DEBUG or settings.SENTRY_DSN:
+        return []
+    return [
+        Error(
+            "Не задан SENTRY_DSN: ошибки не будут отправляться в Sentry.",
+            hint="Добавьте SENTRY_DSN в .env сервера.",
+            id="services.E001",
+        )
+    ]
@@ -0,0 +1,328 @@
+"""Пул соединений с базой данных в рамках процесса.
+
+Django 3.2 открывает соединение на каждый запрос (CONN_MAX_AGE = 0)
+или держит по одному на поток. Бэкенды services.db.postgresql и
+services.db.sqlite3 вместо закрытия возвращают соединение в пул
+процесса, а следующий запрос любого потока берет его оттуда.
+
+Параметры пула задает ключ POOL настроек базы:
+
+* SIZE - сколько соединений процесс держит открытыми, 0 выключает пул;
+* TIMEOUT - сколько секунд ждать свободного соединения, когда все заняты;
+* IDLE_TIMEOUT - через сколько секунд простоя соединение закрывается;
+* HEALTH_CHECK_INTERVAL - соединение, простоявшее дольше, перед выдачей
+  проверяется запросом SELECT 1, мертвое заменяется новым.
+
+Счетчики пулов текущего процесса отдает pool_stats.
+"""
+import os
+import threading
+import time
+
+from django.db import DatabaseError
+
+COUNTERS = (
+    "acquired",
+    "reused",
+    "opened",
+    "waits",
+    "wait_ms",
+    "timeouts",
+    "reconnects",
+    "expired",
+    "discarded",
+)
+
+
+class PoolTimeout(DatabaseError):
+    """Свободное соединение не появилось за POOL["TIMEOUT"] секунд."""
+
+
+class ConnectionPool:
+    """Открытые соединения с одной базой, общие для потоков процесса.
+
+    Свободные соединения выдаются в порядке, обратном возврату: так
+    в работе остаются недавно использованные, а лишние простаивают и
+    закрываются по IDLE_TIMEOUT. Соединения открываются и закрываются
+    вне блокировки пула.
+    """
+
+    def __init__(self, size, timeout, idle_timeout, health_check_interval):
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._condition = threading.Condition()
+        # (соединение, состояние обертки, время возврата)
+        self._idle = []
+        self._open = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def _pop_expired(self, now):
+        """Убирает из пула соединения, простоявшие дольше IDLE_TIMEOUT."""
+        expired = []
+        while self._idle and now - self._idle[0][2] >= self.idle_timeout:
+            expired.append(self._idle.pop(0)[0])
+        self._open -= len(expired)
+        self.counters["expired"] += len(expired)
+        return expired
+
+    def acquire(self, connect, check, close):
+        """Выдает свободное соединение или открывает новое.
+
+        connect открывает соединение и возвращает его вместе с
+        состоянием обертки, check проверяет, живо ли соединение,
+        close закрывает его. Возвращает соединение, состояние и
+        признак того, что соединение взято из пула.
+        """
+        waited_since = None
+        expired = []
+        with self._condition:
+            self.counters["acquired"] += 1
+            while True:
+                now = time.monotonic()
+                expired += self._pop_expired(now)
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    entry = None
+                    break
+                if waited_since is None:
+                    waited_since = now
+                    self.counters["waits"] += 1
+                remaining = waited_since + self.timeout - now
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Все {self.size} соединений пула заняты."
+                    )
+                self._condition.wait(remaining)
+            if waited_since is not None:
+                self.counters["wait_ms"] += round(
+                    (time.monotonic() - waited_since) * 1000, 3
+                )
+        for connection in expired:
+            close(connection)
+        if entry is not None:
+            connection, state, released_at = entry
+            idle = time.monotonic() - released_at
+            if idle < self.health_check_interval or check(connection):
+                self._count("reused")
+                return connection, state, True
+            # место мертвого соединения занимает новое
+            self._count("reconnects")
+            close(connection)
+        try:
+            connection, state = connect()
+        except BaseException:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        self._count("opened")
+        return connection, state, False
+
+    def release(self, connection, state, close=None):
+        """Возвращает соединение в пул.
+
+        С close соединение не годится для повторного использования:
+        оно закрывается, а место в пуле освобождается.
+        """
+        with self._condition:
+            if close is None:
+                self._idle.append((connection, state, time.monotonic()))
+            else:
+                self._open -= 1
+                self.counters["discarded"] += 1
+            self._condition.notify()
+        if close is not None:
+            close(connection)
+
+    def drain(self, close):
+        """Закрывает все свободные соединения пула."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify(len(idle))
+        for connection, _, _ in idle:
+            close(connection)
+
+    def _count(self, counter):
+        with self._condition:
+            self.counters[counter] += 1
+
+    def snapshot(self):
+        with self._condition:
+            snapshot = dict(self.counters)
+            snapshot.update(
+                size=self.size,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+            )
+        return snapshot
+
+    def reset(self):
+        with self._condition:
+            self.counters = dict.fromkeys(COUNTERS, 0)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _forget_pools():
+    """Дочерний процесс не наследует пулы родителя.
+
+    Соединения родителя нельзя ни использовать, ни закрывать из
+    потомка, поэтому они просто забываются.
+    """
+    global _pools, _pools_lock
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
+
+
+def get_pool(alias, key, options):
+    """Пул базы alias с параметрами подключения key."""
+    with _pools_lock:
+        pool = _pools.get((alias, key))
+        if pool is None:
+            pool = _pools[alias, key] = ConnectionPool(
+                size=options["SIZE"],
+                timeout=options.get("TIMEOUT", 10),
+                idle_timeout=options.get("IDLE_TIMEOUT", 300),
+                health_check_interval=options.get("HEALTH_CHECK_INTERVAL", 30),
+            )
+        return pool
+
+
+def drain_pools(alias, close):
+    """Закрывает свободные соединения пулов базы alias.
+
+    С alias None закрываются соединения пулов всех баз.
+    """
+    with _pools_lock:
+        pools = [
+            pool
+            for (name, _), pool in _pools.items()
+            if alias is None or name == alias
+        ]
+    for pool in pools:
+        pool.drain(close)
+
+
+def pool_stats():
+    """Счетчики пулов текущего процесса по алиасам баз.
+
+    У одной базы может быть несколько пулов, например рабочий и
+    тестовый, их счетчики складываются.
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    stats = {}
+    for (alias, _), pool in pools:
+        snapshot = pool.snapshot()
+        total = stats.setdefault(alias, dict.fromkeys(snapshot, 0))
+        for name, value in snapshot.items():
+            total[name] += value
+    return {"pid": os.getpid(), "pools": stats}
+
+
+def reset_pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.reset()
+
+
+class PooledDatabaseWrapperMixin:
+    """Примесь к DatabaseWrapper бэкенда: соединения берутся из пула.
+
+    pooled_attributes - атрибуты обертки, которые бэкенд выставляет
+    при открытии соединения; для соединения из пула они
+    восстанавливаются из сохраненного состояния.
+    """
+
+    pooled_attributes = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._pool_state = None
+        # взято ли текущее соединение из пула, а не открыто заново
+        self.pool_reused = False
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict.get("POOL") or {}
+        if not options.get("SIZE"):
+            self.pool_reused = False
+            return super().get_new_connection(conn_params)
+        pool = get_pool(self.alias, repr(sorted(conn_params.items())), options)
+        connection, state, reused = pool.acquire(
+            lambda: self._open_pooled(conn_params),
+            self._is_alive,
+            self._close_pooled,
+        )
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._pool = pool
+        self._pool_state = state
+        self.pool_reused = reused
+        return connection
+
+    def _open_pooled(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        state = {name: getattr(self, name) for name in self.pooled_attributes}
+        return connection, state
+
+    def _is_alive(self, connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close_pooled(self, connection):
+        try:
+            connection.close()
+        except self.Database.Error:
+            pass
+
+    def _close(self):
+        pool = self._pool
+        if pool is None:
+            return super()._close()
+        self._pool = None
+        # соединение с незавершенной транзакцией или после ошибки базы
+        # следующему запросу не отдается
+        broken = (
+            self.in_atomic_block
+            or not self.autocommit
+            or self.errors_occurred
+        )
+        pool.release(
+            self.connection,
+            self._pool_state,
+            close=self._close_pooled if broken else None,
+        )
+
+
+class PooledDatabaseCreationMixin:
+    """Перед удалением тестовой базы закрывает соединения в пулах.
+
+    Закрываются пулы всех баз: к тестовой базе подключены и реплики,
+    для которых она служит зеркалом.
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        drain_pools(None, self.connection._close_pooled)
+        super()._destroy_test_db(test_database_name, verbosity)
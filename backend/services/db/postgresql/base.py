@@ -0,0 +1,14 @@
+"""PostgreSQL с пулом соединений процесса, см. services.db."""
+from django.db.backends.postgresql import base, creation
+
+from services.db import PooledDatabaseCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    # уровень изоляции бэкенд узнает у соединения при его открытии
+    pooled_attributes = ("isolation_level",)
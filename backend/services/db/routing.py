@@ -0,0 +1,82 @@
+"""Чтение из реплик с записью в основную базу.
+
+Все записи идут в основную базу default. Чтения уходят в реплику
+только внутри read_from: ее включают для безопасных запросов
+представления чтения каталога и истории покупок. Пользователь,
+который только что что-то изменил, DB_REPLICA_STICKY_SECONDS секунд
+читает из основной базы, чтобы сразу видеть свои изменения, даже
+если реплика от нее отстает.
+"""
+import contextlib
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_CACHE_KEY = "replica-sticky:{user}"
+
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+
+def sticky_cache():
+    return caches[settings.DB_REPLICA_CACHE_ALIAS]
+
+
+def mark_sticky(user_id):
+    """Направляет чтения пользователя в основную базу на время."""
+    if settings.DATABASE_REPLICAS and settings.DB_REPLICA_STICKY_SECONDS:
+        sticky_cache().set(
+            STICKY_CACHE_KEY.format(user=user_id),
+            True,
+            settings.DB_REPLICA_STICKY_SECONDS,
+        )
+
+
+def choose_replica(user_id=None):
+    """Реплика для чтений запроса или None для основной базы."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    if user_id is not None and sticky_cache().get(
+        STICKY_CACHE_KEY.format(user=user_id)
+    ):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextlib.contextmanager
+def read_from(alias):
+    """Чтения внутри блока идут в базу alias, None - в основную."""
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Маршрутизатор DATABASE_ROUTERS для основной базы и реплик."""
+
+    def db_for_read(self, model, **hints):
+        # общий кэш в базе (DatabaseCache) читается из основной базы:
+        # из отстающей реплики пришли бы прежние версии моделей
+        if model._meta.app_label == "django_cache":
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # в репликах те же данные, что и в основной базе
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплики получают репликацией из основной базы
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
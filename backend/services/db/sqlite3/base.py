@@ -0,0 +1,12 @@
+"""SQLite с пулом соединений процесса, см. services.db."""
+from django.db.backends.sqlite3 import base, creation
+
+from services.db import PooledDatabaseCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
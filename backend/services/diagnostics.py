@@ -0,0 +1,82 @@
+"""Общие средства замеров: тестовая база и обход эндпоинтов API."""
+import contextlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from rest_framework.test import APIClient
+
+from payments.models import Payment
+
+
+@contextlib.contextmanager
+def test_database(keepdb=False, name=None):
+    """Временная тестовая база, как у тестового раннера Django.
+
+    Рабочая база не затрагивается: все замеры идут на копии схемы.
+    name - файл базы для замеров, в которых к ней обращаются другие
+    процессы: базу SQLite в памяти видит только текущий.
+    """
+    if name is not None:
+        connection.settings_dict["TEST"]["NAME"] = name
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def read_endpoints(include_users=False):
+    """Пользователь с платежами и GET-эндпоинты /api/v1/ для него.
+
+    С include_users добавляются эндпоинты пользователей djoser,
+    в том числе полный список пользователей.
+    Возвращает пользователя и список пар (название, адрес).
+    """
+    payment = Payment.objects.order_by("pk").values("user", "service")[0]
+    user = get_user_model().objects.get(pk=payment["user"])
+    service_id = payment["service"]
+    endpoints = [
+        ("services-list", "/api/v1/services/"),
+        ("services-detail", f"/api/v1/services/{service_id}/"),
+        ("catalog", "/api/v1/catalog/"),
+        ("categories-list", "/api/v1/categories/"),
+        ("categories-detail", f"/api/v1/categories/{service_id}/"),
+        ("tariffs-list", "/api/v1/tariffs/"),
+        ("sell-history", "/api/v1/sell_history/"),
+    ]
+    if include_users:
+        endpoints += [
+            ("users-me", "/api/v1/users/me/"),
+            ("users-list", "/api/v1/users/"),
+        ]
+    return user, endpoints
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@contextlib.contextmanager
+def record_queries():
+    """Собирает выполненные запросы с параметрами."""
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def clear_caches():
+    """Очищает все кэши, чтобы замер попадал в базу данных."""
+    for cache in caches.all():
+        cache.clear()
@@ -0,0 +1,140 @@
+"""Работа с файлами изображений сервисов и категорий."""
+import base64
+import hashlib
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from jobs.queue import enqueue
+
+IMAGE_HASH_KEY = "image:hash:{digest}"
+IMAGE_PAYLOAD_KEY = "image:base64:{digest}"
+
+# Уменьшенные копии изображений: название -> наибольшая сторона в пикселях.
+RENDITION_SIZES = {
+    "small": 96,
+    "medium": 256,
+    "large": 512,
+}
+RENDITIONS_DIR = "renditions"
+RENDITION_FORMAT = "WEBP"
+RENDITION_EXTENSION = "webp"
+RENDITION_QUALITY = 80
+
+
+def _file_key(storage, name):
+    """Ключ файла по имени, размеру и времени изменения, без чтения."""
+    stamp = "|".join(
+        (
+            name,
+            str(storage.size(name)),
+            str(storage.get_modified_time(name).timestamp()),
+        )
+    )
+    digest = hashlib.md5(stamp.encode()).hexdigest()
+    return IMAGE_HASH_KEY.format(digest=digest)
+
+
+def get_base64_payload(file, rendition=None):
+    """Содержимое изображения в base64.
+
+    С rendition кодируется уменьшенная копия, если она уже создана.
+    Закодированные данные хранятся в кэше по хэшу содержимого, так что
+    одинаковые изображения кодируются один раз. Хэш содержимого
+    запоминается по имени, размеру и времени изменения файла, поэтому
+    при попадании в кэш файл с диска не читается.
+    """
+    storage, name = file.storage, file.name
+    if rendition is not None:
+        copy = rendition_name(name, rendition)
+        if storage.exists(copy):
+            name = copy
+    file_key = _file_key(storage, name)
+    digest = cache.get(file_key)
+    if digest is not None:
+        payload = cache.get(IMAGE_PAYLOAD_KEY.format(digest=digest))
+        if payload is not None:
+            return payload
+    with storage.open(name, "rb") as image:
+        content = image.read()
+    digest = hashlib.sha256(content).hexdigest()
+    payload = base64.b64encode(content).decode()
+    cache.set(file_key, digest, settings.IMAGE_CACHE_TIMEOUT)
+    cache.set(
+        IMAGE_PAYLOAD_KEY.format(digest=digest),
+        payload,
+        settings.IMAGE_CACHE_TIMEOUT,
+    )
+    return payload
+
+
+def rendition_name(name, rendition):
+    """Путь уменьшенной копии изображения в хранилище."""
+    stem = posixpath.splitext(name)[0]
+    return posixpath.join(
+        RENDITIONS_DIR, rendition, f"{stem}.{RENDITION_EXTENSION}"
+    )
+
+
+def rendition_url(file, rendition):
+    """Ссылка на уменьшенную копию или на оригинал, пока копии нет."""
+    name = rendition_name(file.name, rendition)
+    if file.storage.exists(name):
+        return file.storage.url(name)
+    return file.url
+
+
+def missing_renditions(name, storage=default_storage):
+    """Размеры, копий которых у изображения еще нет."""
+    return [
+        rendition
+        for rendition in RENDITION_SIZES
+        if not storage.exists(rendition_name(name, rendition))
+    ]
+
+
+def generate_renditions(name, storage=default_storage, force=False):
+    """Создает уменьшенные копии изображения всех размеров.
+
+    Существующие копии пропускаются, если не передан force.
+    Возвращает количество созданных копий.
+    """
+    missing = [
+        (rendition, RENDITION_SIZES[rendition])
+        for rendition in (
+            RENDITION_SIZES if force else missing_renditions(name, storage)
+        )
+    ]
+    if not missing:
+        return 0
+    with storage.open(name, "rb") as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    for rendition, size in missing:
+        copy = image.copy()
+        copy.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        copy.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+        target = rendition_name(name, rendition)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buffer.getvalue()))
+    return len(missing)
+
+
+def schedule_renditions(name, model):
+    """Ставит создание копий изображения в очередь фоновых задач.
+
+    После создания копий версия модели повышается, чтобы закэшированные
+    ответы со ссылками на оригинал были перестроены.
+    """
+    enqueue(
+        "services.generate_renditions", name=name, model=model._meta.label
+    )
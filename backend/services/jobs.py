@@ -0,0 +1,13 @@
+"""Фоновые задачи приложения services."""
+from django.apps import apps
+
+from jobs.queue import job
+from .cache import bump_version
+from .images import generate_renditions
+
+
+@job("services.generate_renditions", max_attempts=5)
+def generate_image_renditions(name, model):
+    """Создает уменьшенные копии загруженного изображения."""
+    if generate_renditions(name):
+        bump_version(apps.get_model(model))
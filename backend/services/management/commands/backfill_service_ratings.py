@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from services.tasks import backfill_service_ratings
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики оценок сервисов по существующим оценкам."
+
+    def handle(self, *args, **options):
+        updated = backfill_service_ratings()
+        self.stdout.write(
+            self.style.SUCCESS(f"Обновлено сервисов: {updated}")
+        )
@@ -0,0 +1,136 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+
+from services.db import (PooledDatabaseWrapperMixin, pool_stats,
+                         reset_pool_stats)
+from services.diagnostics import (api_client, clear_caches, read_endpoints,
+                                  test_database)
+from services.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает задержку запросов к API с пулом соединений и без "
+        "него: каждый запрос, как в рабочем режиме, заканчивается "
+        "закрытием соединения, которое пул возвращает себе. Выводит "
+        "p50 по эндпоинтам, сэкономленное время и счетчики пула."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--services", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument(
+            "--connect-latency", type=float, default=0.0,
+            help=(
+                "Задержка открытия нового соединения в миллисекундах, "
+                "имитирующая сетевое подключение к удаленной базе."
+            ),
+        )
+        parser.add_argument(
+            "--output", help="Сохранить результат в JSON-файл."
+        )
+
+    def handle(self, *args, **options):
+        wrapper = connections[DEFAULT_DB_ALIAS]
+        if not isinstance(wrapper, PooledDatabaseWrapperMixin):
+            raise CommandError(
+                "Бэкенд базы default не поддерживает пул соединений."
+            )
+        latency = options["connect_latency"] / 1000
+
+        def delay_connect(sender, connection, **kwargs):
+            if not connection.pool_reused:
+                time.sleep(latency)
+
+        if latency:
+            connection_created.connect(delay_connect, weak=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                database = os.path.join(directory, "benchmark.sqlite3")
+                # база в памяти не закрывается, а пул срабатывает на закрытии
+                with test_database(name=database):
+                    seeded = seed_dataset(
+                        users=options["users"],
+                        services=options["services"],
+                        seed=0,
+                    )
+                    results, stats = self.run_benchmarks(options["requests"])
+        finally:
+            connection_created.disconnect(delay_connect)
+        self.print_report(results, stats)
+        if options["output"]:
+            report = {
+                "volumes": seeded,
+                "requests": options["requests"],
+                "connect_latency_ms": options["connect_latency"],
+                "endpoints": results,
+                "pool": stats,
+            }
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def run_benchmarks(self, requests):
+        user, endpoints = read_endpoints()
+        client = api_client(user)
+        client.raise_request_exception = False
+        pool = connection.settings_dict.get("POOL") or {}
+        modes = (
+            ("direct", dict(pool, SIZE=0)),
+            ("pooled", dict(pool, SIZE=max(settings.DB_POOL["SIZE"], 1))),
+        )
+        results = {}
+        stats = None
+        for mode, options in modes:
+            connection.close()
+            connection.settings_dict["POOL"] = options
+            reset_pool_stats()
+            for name, url in [("connect", None)] + endpoints:
+                timings = []
+                # первый запрос прогревает кэши кода, он не учитывается
+                for number in range(requests + 1):
+                    clear_caches()
+                    started = time.perf_counter()
+                    if url is None:
+                        connection.ensure_connection()
+                    else:
+                        client.get(url)
+                    # так соединение закрывается в конце запроса
+                    connection.close()
+                    if number:
+                        timings.append(
+                            (time.perf_counter() - started) * 1000
+                        )
+                result = results.setdefault(name, {"url": url})
+                result[f"{mode}_p50_ms"] = round(statistics.median(timings), 3)
+            if mode == "pooled":
+                stats = pool_stats()["pools"].get(connection.alias)
+        connection.settings_dict["POOL"] = pool
+        for result in results.values():
+            result["saved_ms"] = round(
+                result["direct_p50_ms"] - result["pooled_p50_ms"], 3
+            )
+        return results, stats
+
+    def print_report(self, results, stats):
+        self.stdout.write(
+            f"{'эндпоинт':<20}{'без пула':>10}{'с пулом':>10}"
+            f"{'экономия':>10}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20}{result['direct_p50_ms']:>10.3f}"
+                f"{result['pooled_p50_ms']:>10.3f}{result['saved_ms']:>10.3f}"
+            )
+        self.stdout.write(
+            "\nСчетчики пула: "
+            + ", ".join(f"{name}={value}" for name, value in stats.items())
+        )
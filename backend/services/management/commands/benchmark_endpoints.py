@@ -0,0 +1,172 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.diagnostics import (api_client, clear_caches, read_endpoints,
+                                  record_queries, test_database)
+from services.seed import seed_dataset
+
+# Допустимый рост задержки p95 относительно базового замера.
+DEFAULT_THRESHOLD = 0.2
+
+
+class Command(BaseCommand):
+    help = (
+        "Наполняет тестовую базу заданным объемом данных и замеряет "
+        "задержку p50/p95, число SQL-запросов и пик памяти для каждого "
+        "GET-эндпоинта /api/v1/. Результат можно сохранить как базовый "
+        "и сравнивать с ним замеры следующих коммитов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--services", type=int, default=50)
+        parser.add_argument("--categories", type=int, default=5)
+        parser.add_argument(
+            "--subscriptions", type=int, default=5,
+            help="Подписок на пользователя.",
+        )
+        parser.add_argument(
+            "--payments", type=int, default=6,
+            help="Платежей на подписку.",
+        )
+        parser.add_argument(
+            "--ratings", type=int, default=3,
+            help="Оценок на пользователя.",
+        )
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Очищать кэши перед каждым запросом.",
+        )
+        parser.add_argument(
+            "--output", help="Сохранить результат в JSON-файл."
+        )
+        parser.add_argument(
+            "--compare", help="Сравнить с результатом из JSON-файла."
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=DEFAULT_THRESHOLD
+        )
+
+    def handle(self, *args, **options):
+        volumes = {
+            name: options[name]
+            for name in (
+                "users",
+                "services",
+                "categories",
+                "subscriptions",
+                "payments",
+                "ratings",
+            )
+        }
+        with test_database():
+            seeded = seed_dataset(seed=0, **volumes)
+            results = self.run_benchmarks(
+                options["requests"], options["cold"]
+            )
+        report = {
+            "volumes": seeded,
+            "requests": options["requests"],
+            "cold": options["cold"],
+            "endpoints": results,
+        }
+        self.print_report(results)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+            if (baseline["volumes"], baseline["cold"]) != (
+                seeded,
+                options["cold"],
+            ):
+                raise CommandError(
+                    "Базовый замер снят на другом объеме данных "
+                    "или в другом режиме кэша."
+                )
+            regressions = self.compare(
+                baseline["endpoints"], results, options["threshold"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Регрессии относительно базового замера:\n"
+                    + "\n".join(regressions)
+                )
+
+    def run_benchmarks(self, requests, cold):
+        user, endpoints = read_endpoints(include_users=True)
+        client = api_client(user)
+        # Падение эндпоинта попадает в отчет статусом 500, а не обрывает замер.
+        client.raise_request_exception = False
+        results = {}
+        for name, url in endpoints:
+            # Число запросов считается по первому обращению с пустыми кэшами.
+            clear_caches()
+            with record_queries() as queries:
+                response = client.get(url)
+            timings = []
+            for _ in range(requests):
+                if cold:
+                    clear_caches()
+                started = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if cold:
+                clear_caches()
+            tracemalloc.start()
+            client.get(url)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = {
+                "url": url,
+                "status": response.status_code,
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(self.percentile(timings, 95), 3),
+                "queries": len(queries),
+                "peak_kb": round(peak / 1024, 1),
+                "bytes": len(response.content),
+            }
+        return results
+
+    @staticmethod
+    def percentile(values, percent):
+        ordered = sorted(values)
+        index = max(0, round(percent / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def print_report(self, results):
+        self.stdout.write(
+            f"{'эндпоинт':<20}{'статус':>7}{'p50 мс':>10}{'p95 мс':>10}"
+            f"{'запросы':>9}{'пик КБ':>10}{'байт':>10}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20}{result['status']:>7}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['queries']:>9}"
+                f"{result['peak_kb']:>10.1f}{result['bytes']:>10}"
+            )
+
+    def compare(self, baseline, results, threshold):
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result["queries"] > previous["queries"]:
+                regressions.append(
+                    f"{name}: запросов {previous['queries']} -> "
+                    f"{result['queries']}"
+                )
+            if result["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{name}: p95 {previous['p95_ms']} -> "
+                    f"{result['p95_ms']} мс"
+                )
+        return regressions
@@ -0,0 +1,271 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from services.diagnostics import read_endpoints, test_database
+from services.seed import seed_dataset
+
+# Эндпоинты, которые в режиме ASGI обслуживают async-представления.
+ENDPOINTS = ("services-list", "services-detail", "catalog")
+MODES = {
+    "wsgi": ("pay2u.wsgi:application", None),
+    "asgi": ("pay2u.asgi:application", "uvicorn.workers.UvicornWorker"),
+}
+STARTUP_TIMEOUT = 60
+# Задержка каждого SQL-запроса в воркерах, имитирующая медленную базу.
+LATENCY_HOOK = """
+import time
+
+from django.db.backends.signals import connection_created
+
+LATENCY = {latency}
+
+
+def delay(execute, sql, params, many, context):
+    time.sleep(LATENCY)
+    return execute(sql, params, many, context)
+
+
+def add_delay(sender, connection, **kwargs):
+    # обертка соединения живет дольше подключения к базе
+    if delay not in connection.execute_wrappers:
+        connection.execute_wrappers.append(delay)
+
+
+def post_fork(server, worker):
+    if LATENCY:
+        connection_created.connect(add_delay, weak=False)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает обслуживание каталога в режимах WSGI (синхронные "
+        "воркеры gunicorn) и ASGI (воркеры uvicorn с async-"
+        "представлениями) на одной тестовой базе: пропускную "
+        "способность и задержки p50/p95/p99 при разной конкурентности."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--services", type=int, default=50)
+        parser.add_argument(
+            "--workers", type=int, default=2,
+            help="Воркеров gunicorn в обоих режимах.",
+        )
+        parser.add_argument(
+            "--concurrency", default="1,8,32",
+            help="Уровни одновременных клиентов через запятую.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=300,
+            help="Запросов на каждый уровень конкурентности.",
+        )
+        parser.add_argument(
+            "--db-latency", type=float, default=0.0,
+            help="Задержка каждого SQL-запроса в миллисекундах.",
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Отключить кэш ответов и каталога в воркерах.",
+        )
+        parser.add_argument(
+            "--modes", default="wsgi,asgi",
+            help="Сравниваемые режимы через запятую.",
+        )
+        parser.add_argument(
+            "--output", help="Сохранить результат в JSON-файл."
+        )
+
+    def handle(self, *args, **options):
+        modes = options["modes"].split(",")
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Неизвестные режимы: {', '.join(unknown)}")
+        levels = [int(level) for level in options["concurrency"].split(",")]
+        with tempfile.TemporaryDirectory() as directory:
+            hook = os.path.join(directory, "hooks.py")
+            with open(hook, "w", encoding="utf-8") as file:
+                file.write(
+                    LATENCY_HOOK.format(latency=options["db_latency"] / 1000)
+                )
+            database = os.path.join(directory, "benchmark.sqlite3")
+            with test_database(name=database):
+                seeded = seed_dataset(
+                    users=options["users"],
+                    services=options["services"],
+                    seed=0,
+                )
+                user, endpoints = read_endpoints()
+                token, _ = Token.objects.get_or_create(user=user)
+                urls = [url for name, url in endpoints if name in ENDPOINTS]
+                connection.close()
+                results = {}
+                for mode in modes:
+                    server = _Server(
+                        mode, database, hook, options["workers"],
+                        options["cold"],
+                    )
+                    with server as port:
+                        results[mode] = {
+                            level: self.load(
+                                port, urls, token.key, level,
+                                options["requests"],
+                            )
+                            for level in levels
+                        }
+        self.print_report(results)
+        if options["output"]:
+            report = {
+                "volumes": seeded,
+                "workers": options["workers"],
+                "db_latency_ms": options["db_latency"],
+                "cold": options["cold"],
+                "results": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def load(self, port, urls, token, concurrency, requests):
+        """Отправляет requests запросов из concurrency потоков."""
+        timings = []
+        errors = []
+        lock = threading.Lock()
+        counter = iter(range(requests))
+
+        def client():
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            headers = {"Authorization": f"Token {token}"}
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    break
+                url = urls[number % len(urls)]
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", url, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    failed = response.status != 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = http.client.HTTPConnection(
+                        "127.0.0.1", port
+                    )
+                    failed = True
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    (errors if failed else timings).append(elapsed)
+            connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            "rps": round(len(timings) / elapsed, 1),
+            "p50_ms": round(self.percentile(timings, 50), 2),
+            "p95_ms": round(self.percentile(timings, 95), 2),
+            "p99_ms": round(self.percentile(timings, 99), 2),
+            "errors": len(errors),
+        }
+
+    @staticmethod
+    def percentile(ordered, percent):
+        if not ordered:
+            return 0.0
+        index = max(0, round(percent / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def print_report(self, results):
+        self.stdout.write(
+            f"{'режим':<7}{'клиентов':>9}{'запр/с':>9}{'p50 мс':>10}"
+            f"{'p95 мс':>10}{'p99 мс':>10}{'ошибок':>8}"
+        )
+        for mode, levels in results.items():
+            for level, result in levels.items():
+                self.stdout.write(
+                    f"{mode:<7}{level:>9}{result['rps']:>9.1f}"
+                    f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                    f"{result['p99_ms']:>10.2f}{result['errors']:>8}"
+                )
+
+
+class _Server:
+    """gunicorn с проектом в заданном режиме на свободном порту."""
+
+    def __init__(self, mode, database, hook, workers, cold):
+        self.mode = mode
+        self.database = database
+        self.hook = hook
+        self.workers = workers
+        self.cold = cold
+        self.process = None
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        app, worker_class = MODES[self.mode]
+        command = [
+            sys.executable, "-m", "gunicorn",
+            "--config", self.hook,
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(self.workers),
+            "--log-level", "warning",
+        ]
+        if worker_class:
+            command += ["--worker-class", worker_class]
+        env = dict(os.environ, SQLITE_PATH=self.database)
+        env.pop("ASYNC_VIEWS", None)
+        if self.cold:
+            env.update(API_CACHE_TIMEOUT="0", CATALOG_CACHE_TIMEOUT="0")
+        self.process = subprocess.Popen(
+            command + [app], cwd=settings.BASE_DIR, env=env
+        )
+        self.wait_ready(port)
+        return port
+
+    def wait_ready(self, port):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"Сервер {self.mode} не запустился.")
+            connection = http.client.HTTPConnection(
+                "127.0.0.1", port, timeout=5
+            )
+            try:
+                connection.request("GET", "/api/v1/catalog/")
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            finally:
+                connection.close()
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise CommandError(f"Сервер {self.mode} не ответил вовремя.")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
@@ -0,0 +1,69 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from payments.bank import SimulatedBank
+from payments.tasks import renew_autopayments
+from services.diagnostics import (api_client, clear_caches, read_endpoints,
+                                  record_queries, test_database)
+from services.query_plans import full_scans
+from services.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Наполняет тестовую базу, выполняет EXPLAIN для запросов каждого "
+        "GET-эндпоинта /api/v1/ и завершается с ошибкой, если большая "
+        "таблица читается полным сканированием."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--services", type=int, default=50)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        with test_database(keepdb=options["keepdb"]):
+            seed_dataset(
+                users=options["users"], services=options["services"], seed=0
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            failures = self.check_endpoints()
+            failures += self.check_renewals()
+        if failures:
+            raise CommandError(
+                "Полное сканирование больших таблиц:\n" + "\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("Полных сканирований нет."))
+
+    def check_endpoints(self):
+        user, endpoints = read_endpoints()
+        client = api_client(user)
+        failures = []
+        for name, url in endpoints:
+            clear_caches()
+            with record_queries() as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                failures.append(f"{name}: статус {response.status_code}")
+                continue
+            failures += self.check_queries(name, queries)
+            self.stdout.write(f"{name}: запросов {len(queries)}")
+        return failures
+
+    def check_queries(self, name, queries):
+        return [
+            f"{name}: {', '.join(tables)}\n  {sql}\n  {plan}"
+            for tables, sql, plan in full_scans(queries)
+        ]
+
+    def check_renewals(self):
+        """Проверяет запросы продления подписок с автоплатежом."""
+        today = timezone.localdate() + datetime.timedelta(days=365)
+        with record_queries() as queries:
+            renew_autopayments(today=today, bank=SimulatedBank())
+        self.stdout.write(f"renewals: запросов {len(queries)}")
+        return self.check_queries("renewals", queries)
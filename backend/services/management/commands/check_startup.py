@@ -0,0 +1,169 @@
+import json
+import os
+import statistics
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from services.diagnostics import test_database
+from services.seed import seed_dataset
+from services.startup import (MAX_FIRST_REQUEST_MS, MAX_IMPORT_MS, ProbeError,
+                              probe, run_probe)
+
+DEFAULT_THRESHOLD = 0.2
+METRICS = ("process_ms", "import_ms", "first_request_ms")
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет холодный старт воркера: время импорта pay2u.wsgi "
+        "и первого запроса в свежем процессе (медиана по нескольким "
+        "запускам). Сравнивает результат с базовым замером и "
+        "бюджетами и завершается ошибкой при регрессии или "
+        "загрузке модулей, которые должны загружаться лениво."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs", type=int, default=5,
+            help="Число запусков свежего процесса.",
+        )
+        parser.add_argument(
+            "--path", default="/api/v1/catalog/",
+            help="Адрес первого запроса.",
+        )
+        parser.add_argument(
+            "--top", type=int, default=10,
+            help="Показать самые долгие импорты верхнего уровня.",
+        )
+        parser.add_argument(
+            "--max-import-ms", type=float, default=MAX_IMPORT_MS,
+            help="Бюджет времени импорта pay2u.wsgi.",
+        )
+        parser.add_argument(
+            "--max-first-request-ms", type=float,
+            default=MAX_FIRST_REQUEST_MS,
+            help="Бюджет времени первого запроса.",
+        )
+        parser.add_argument(
+            "--output", help="Сохранить результат в JSON-файл."
+        )
+        parser.add_argument(
+            "--compare", help="Сравнить с результатом из JSON-файла."
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=DEFAULT_THRESHOLD
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "startup.sqlite3")
+            with test_database(name=database):
+                seed_dataset(users=20, services=10, seed=0)
+                connection.close()
+                try:
+                    runs = [
+                        probe(database, options["path"])
+                        for _ in range(options["runs"])
+                    ]
+                except ProbeError as error:
+                    raise CommandError(
+                        f"Процесс замера завершился с ошибкой:\n{error}"
+                    ) from error
+                imports = []
+                if options["top"]:
+                    imports = self.heaviest_imports(
+                        database, options["path"], options["top"]
+                    )
+        failed = [run for run in runs if run["status"] != 200]
+        if failed:
+            raise CommandError(
+                f"Первый запрос к {options['path']} вернул "
+                f"статус {failed[0]['status']}."
+            )
+        result = {
+            metric: round(statistics.median(run[metric] for run in runs), 1)
+            for metric in METRICS
+        }
+        result["modules"] = max(run["modules"] for run in runs)
+        loaded = sorted({name for run in runs for name in run["loaded"]})
+        self.print_report(result, imports)
+        if options["output"]:
+            report = {"path": options["path"], "runs": options["runs"]}
+            report.update(result)
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        regressions = self.check_budgets(result, options)
+        regressions += [f"загружен при старте: {name}" for name in loaded]
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+            if baseline["path"] != options["path"]:
+                raise CommandError(
+                    "Базовый замер снят на другом адресе первого запроса."
+                )
+            regressions += self.compare(
+                baseline, result, options["threshold"]
+            )
+        if regressions:
+            raise CommandError(
+                "Регрессии холодного старта:\n" + "\n".join(regressions)
+            )
+
+    def heaviest_imports(self, database, path, top):
+        """Модули с наибольшим временем импорта.
+
+        Время берется из -X importtime одного отдельного запуска.
+        В список попадают импорты верхнего уровня и модули, которые
+        они загружают напрямую, в том числе приложения при старте
+        Django.
+        """
+        process = run_probe(database, path, "-X", "importtime")
+        timings = []
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line.split("|")
+            # каждый уровень вложенности добавляет к отступу два пробела
+            if not cumulative.strip().isdigit() or name.startswith("     "):
+                continue
+            timings.append((int(cumulative) / 1000, name.strip()))
+        timings.sort(reverse=True)
+        return timings[:top]
+
+    def print_report(self, result, imports):
+        self.stdout.write(
+            f"{'процесс мс':>12}{'импорт мс':>12}{'запрос мс':>12}"
+            f"{'модулей':>9}"
+        )
+        self.stdout.write(
+            f"{result['process_ms']:>12.1f}{result['import_ms']:>12.1f}"
+            f"{result['first_request_ms']:>12.1f}{result['modules']:>9}"
+        )
+        if imports:
+            self.stdout.write("\nСамые долгие импорты:")
+            for elapsed, name in imports:
+                self.stdout.write(f"{elapsed:>10.1f} мс  {name}")
+
+    def check_budgets(self, result, options):
+        regressions = []
+        budgets = (
+            ("import_ms", options["max_import_ms"]),
+            ("first_request_ms", options["max_first_request_ms"]),
+        )
+        for metric, budget in budgets:
+            if budget and result[metric] > budget:
+                regressions.append(
+                    f"{metric}: {result[metric]} мс при бюджете {budget} мс"
+                )
+        return regressions
+
+    def compare(self, baseline, result, threshold):
+        regressions = []
+        for metric in METRICS:
+            if result[metric] > baseline[metric] * (1 + threshold):
+                regressions.append(
+                    f"{metric}: {baseline[metric]} -> {result[metric]} мс"
+                )
+        return regressions
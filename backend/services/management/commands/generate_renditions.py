@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from services.images import generate_renditions
+from services.models import Category, Service
+
+
+class Command(BaseCommand):
+    help = "Создает уменьшенные копии изображений сервисов и категорий."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать уже существующие копии.",
+        )
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in (Service, Category):
+            names.update(
+                model.objects.exclude(image="")
+                .exclude(image__isnull=True)
+                .values_list("image", flat=True)
+            )
+        created = 0
+        for name in sorted(names):
+            try:
+                created += generate_renditions(name, force=options["force"])
+            except (OSError, ValueError) as error:
+                self.stderr.write(f"{name}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Создано копий: {created}"))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.promocodes import refill_promo_codes
+
+
+class Command(BaseCommand):
+    help = "Дополняет пул свободных промокодов до заданного размера."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", type=int, default=settings.PROMO_CODE_POOL_SIZE
+        )
+
+    def handle(self, *args, **options):
+        created = refill_promo_codes(options["size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Добавлено промокодов: {created}")
+        )
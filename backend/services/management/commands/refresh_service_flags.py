@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from services.tasks import refresh_service_flags
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает флаги new и popular у сервисов."
+
+    def handle(self, *args, **options):
+        aged, popular = refresh_service_flags()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Больше не новые: {aged}, стали популярными: {popular}"
+            )
+        )
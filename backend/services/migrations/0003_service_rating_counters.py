@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:24
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_counters(apps, schema_editor):
+    """Заполняет счетчики по уже существующим оценкам."""
+    Rating = apps.get_model('services', 'Rating')
+    Service = apps.get_model('services', 'Service')
+    alias = schema_editor.connection.alias
+    ratings = (
+        Rating.objects.using(alias)
+        .filter(service=OuterRef('pk'))
+        .order_by()
+        .values('service')
+    )
+    Service.objects.using(alias).update(
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum('stars')).values('total')),
+            0,
+        ),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(total=Count('id')).values('total')),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(
+            fill_rating_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:32
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    """Оставляет по одной, последней, оценке пользователя для сервиса."""
+    Rating = apps.get_model('services', 'Rating')
+    Service = apps.get_model('services', 'Service')
+    duplicates = (
+        Rating.objects.values('user', 'service')
+        .annotate(count=Count('id'), last_id=Max('id'))
+        .filter(count__gt=1)
+    )
+    if not duplicates.exists():
+        return
+    for duplicate in duplicates:
+        Rating.objects.filter(
+            user=duplicate['user'], service=duplicate['service']
+        ).exclude(id=duplicate['last_id']).delete()
+    ratings = (
+        Rating.objects.filter(service=OuterRef('pk'))
+        .order_by()
+        .values('service')
+    )
+    Service.objects.update(
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum('stars')).values('total')),
+            0,
+        ),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(total=Count('id')).values('total')),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_service_rating_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', 'activation_status'], name='subscription_user_status_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_ratings, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('user', 'service'), name='unique_rating'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:38
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_next_payment_dates(apps, schema_editor):
+    """Переносит в подписки дату следующего платежа из последней оплаты."""
+    Payment = apps.get_model('payments', 'Payment')
+    Subscription = apps.get_model('services', 'Subscription')
+    latest = Payment.objects.filter(subscription=OuterRef('pk')).order_by(
+        '-payment_date'
+    )
+    Subscription.objects.update(
+        next_payment_date=Subquery(latest.values('next_payment_date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payment_user_service_next_index'),
+        ('services', '0004_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='next_payment_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Дата следующего платежа'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='renewal_claimed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='renewal_token',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('activation_status', 1), ('autopayment', True)), fields=['next_payment_date'], name='subscription_autopay_due_idx'),
+        ),
+        migrations.RunPython(
+            fill_next_payment_dates, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_subscription_renewal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromoCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=12, unique=True, verbose_name='Промокод')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('allocated_at', models.DateTimeField(blank=True, null=True, verbose_name='Выдан')),
+                ('subscription', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='allocated_promo_code', to='services.subscription', verbose_name='Подписка')),
+            ],
+            options={
+                'verbose_name': 'Промокод',
+                'verbose_name_plural': 'Промокоды',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='promocode',
+            index=models.Index(condition=models.Q(('allocated_at__isnull', True)), fields=['id'], name='promocode_free_idx'),
+        ),
+    ]
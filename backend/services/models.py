@@ -1,10 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import URLValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import Q, UniqueConstraint
 
 User = get_user_model()
 
+# Счетчики оценок сервиса, их сдвигают только обработчики services.signals.
+RATING_COUNTER_FIELDS = ("rating_sum", "rating_count")
+
 
 class Category(models.Model):
     """Модель тематической категории сервиса."""
@@ -62,6 +65,16 @@ class Service(models.Model):
     )
     new = models.BooleanField(default=True)
     popular = models.BooleanField(default=False)
+    rating_sum = models.PositiveIntegerField(
+        "Сумма оценок",
+        default=0,
+        editable=False,
+    )
+    rating_count = models.PositiveIntegerField(
+        "Количество оценок",
+        default=0,
+        editable=False,
+    )
     pub_date = models.DateTimeField(
         verbose_name="Дата добавления",
         auto_now_add=True,
@@ -82,6 +95,29 @@ class Service(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # счетчики в памяти могли устареть, пока параллельные запросы
+        # сдвигали их в базе: обычное сохранение их не перезаписывает
+        if (
+            kwargs.get("update_fields") is None
+            and self.pk is not None
+            and not self._state.adding
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in RATING_COUNTER_FIELDS
+            ]
+        super(Service, self).save(*args, **kwargs)
+
+    @property
+    def average_rating(self):
+        """Средняя оценка сервиса по накопленным счетчикам."""
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
+        return 0
+
 
 class Subscription(models.Model):
     """Модель подписки юзера на сервисы."""
@@ -119,6 +155,22 @@ class Subscription(models.Model):
         null=True,
     )
     trial = models.BooleanField(default=False)
+    next_payment_date = models.DateField(
+        "Дата следующего платежа",
+        blank=True,
+        null=True,
+    )
+    # метка обработчика автоплатежей, взявшего подписку в работу
+    renewal_token = models.UUIDField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    renewal_claimed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Подписка"
@@ -127,6 +179,17 @@ class Subscription(models.Model):
             UniqueConstraint(fields=["user", "service"],
                              name="unique_subscription")
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "activation_status"],
+                name="subscription_user_status_idx",
+            ),
+            models.Index(
+                fields=["next_payment_date"],
+                name="subscription_autopay_due_idx",
+                condition=Q(autopayment=True, activation_status=1),
+            ),
+        ]
 
 
 class Rating(models.Model):
@@ -149,3 +212,60 @@ class Rating(models.Model):
             (5, "5 stars"),
         ]
     )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["user", "service"],
+                             name="unique_rating")
+        ]
+
+    def save(self, *args, **kwargs):
+        # прежняя оценка, от которой считается сдвиг счетчиков сервиса,
+        # заблокирована до конца транзакции (services.signals)
+        with transaction.atomic():
+            super(Rating, self).save(*args, **kwargs)
+
+
+class PromoCode(models.Model):
+    """Заранее сгенерированный промокод из пула.
+
+    Свободный код еще не выдан. Код выдается оплаченной подписке
+    один раз и в пул не возвращается, даже если подписку удалят.
+    """
+
+    code = models.CharField(
+        "Промокод",
+        max_length=12,
+        unique=True,
+    )
+    subscription = models.OneToOneField(
+        Subscription,
+        verbose_name="Подписка",
+        related_name="allocated_promo_code",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    created_at = models.DateTimeField(
+        "Создан",
+        auto_now_add=True,
+    )
+    allocated_at = models.DateTimeField(
+        "Выдан",
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = "Промокод"
+        verbose_name_plural = "Промокоды"
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="promocode_free_idx",
+                condition=Q(allocated_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return self.code
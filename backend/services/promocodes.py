@@ -0,0 +1,167 @@
+"""Пул заранее сгенерированных промокодов и их выдача подпискам.
+
+Коды генерируются пачками командой refill_promo_codes. Там, где
+база умеет SKIP LOCKED, обработчик блокирует первый свободный код,
+пропуская занятые параллельными запросами. Иначе он выбирает код из
+небольшого окна свободных, начинающегося в случайном месте пула, и
+забирает его условным UPDATE, который проходит, только если код еще
+свободен, поэтому параллельные запросы почти не сталкиваются.
+"""
+import logging
+import random
+import secrets
+import string
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import PromoCode, Subscription
+
+logger = logging.getLogger(__name__)
+
+PROMO_CODE_ALPHABET = string.ascii_uppercase + string.digits
+PROMO_CODE_LENGTH = 12
+PROMO_CODE_BATCH_SIZE = 1000
+# Из скольких свободных кодов выбирает один запрос на выдачу.
+CLAIM_WINDOW = 32
+CLAIM_ATTEMPTS = 3
+
+
+class PromoCodePoolEmpty(Exception):
+    """В пуле не осталось свободных промокодов."""
+
+
+class PromoCodeContention(Exception):
+    """Свободные коды есть, но все попытки перехватили другие запросы."""
+
+
+def generate_promo_code():
+    return "".join(
+        secrets.choice(PROMO_CODE_ALPHABET) for _ in range(PROMO_CODE_LENGTH)
+    )
+
+
+def free_promo_codes():
+    return PromoCode.objects.filter(allocated_at__isnull=True)
+
+
+def refill_promo_codes(size=None):
+    """Дополняет пул свободных кодов до size штук.
+
+    Коды вставляются пачками bulk_create с пропуском совпавших,
+    пачка повторяется, пока кодов не хватает.
+    Возвращает число добавленных кодов.
+    """
+    if size is None:
+        size = settings.PROMO_CODE_POOL_SIZE
+    free = free_promo_codes().count()
+    created = 0
+    while free < size:
+        missing = min(size - free, PROMO_CODE_BATCH_SIZE)
+        PromoCode.objects.bulk_create(
+            [PromoCode(code=generate_promo_code()) for _ in range(missing)],
+            ignore_conflicts=True,
+        )
+        refilled = free_promo_codes().count()
+        created += refilled - free
+        free = refilled
+    return created
+
+
+def _claim_window():
+    """Окно из CLAIM_WINDOW свободных кодов со случайного места пула.
+
+    Окно начинается со случайного ключа между наименьшим и
+    наибольшим ключами свободных кодов и при нехватке кодов
+    продолжается с начала пула.
+    """
+    codes = free_promo_codes().order_by("pk").values_list("pk", "code")
+    bounds = free_promo_codes().aggregate(first=Min("pk"), last=Max("pk"))
+    if bounds["first"] is None:
+        return []
+    start = random.randint(bounds["first"], bounds["last"])
+    window = list(codes.filter(pk__gte=start)[:CLAIM_WINDOW])
+    if len(window) < CLAIM_WINDOW:
+        window += list(
+            codes.filter(pk__lt=start)[:CLAIM_WINDOW - len(window)]
+        )
+    return window
+
+
+def _take(subscription, pk, code, now):
+    """Забирает код pk, если он еще свободен."""
+    claimed = free_promo_codes().filter(pk=pk).update(
+        subscription=subscription, allocated_at=now
+    )
+    if claimed:
+        Subscription.objects.filter(pk=subscription.pk).update(
+            promo_code=code
+        )
+    return claimed
+
+
+def _claim(subscription, now):
+    """Одна попытка забрать свободный код.
+
+    Возвращает код, пустую строку, если все коды окна разобрали
+    параллельные запросы, и None, если пул пуст.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            row = (
+                free_promo_codes()
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", "code")
+                .first()
+            )
+            if row is None:
+                return None
+            _take(subscription, *row, now)
+            return row[1]
+    window = _claim_window()
+    if not window:
+        return None
+    random.shuffle(window)
+    for pk, code in window:
+        with transaction.atomic():
+            if _take(subscription, pk, code, now):
+                return code
+    return ""
+
+
+def allocate_promo_code(subscription):
+    """Выдает подписке промокод из пула, повторно - тот же самый.
+
+    Занимает постоянное число запросов независимо от размера пула.
+    Если пул опустел, недостающие коды генерируются на месте,
+    а в журнал пишется предупреждение: пул пора пополнять чаще.
+    PromoCodePoolEmpty означает, что кодов нет и после пополнения,
+    PromoCodeContention - что свободные коды раз за разом забирали
+    параллельные запросы.
+    """
+    if subscription.promo_code:
+        return subscription.promo_code
+    now = timezone.now()
+    empty = False
+    for _ in range(CLAIM_ATTEMPTS):
+        try:
+            code = _claim(subscription, now)
+        except IntegrityError:
+            # код этой подписке уже выдал параллельный запрос
+            code = PromoCode.objects.values_list("code", flat=True).get(
+                subscription=subscription
+            )
+        empty = code is None
+        if empty:
+            logger.warning("Пул промокодов пуст, коды создаются при выдаче")
+            refill_promo_codes(CLAIM_WINDOW)
+            continue
+        if code:
+            subscription.promo_code = code
+            return code
+    if empty:
+        raise PromoCodePoolEmpty
+    raise PromoCodeContention
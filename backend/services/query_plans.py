@@ -0,0 +1,58 @@
+"""Поиск полных сканирований больших таблиц в планах запросов."""
+import re
+
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from payments.models import Cashback, Payment, SpendingLedger
+from services.models import Rating, Subscription
+from users.models import CustomUser
+
+# Таблицы, которые растут вместе с числом пользователей.
+LARGE_MODELS = (
+    CustomUser,
+    Token,
+    Subscription,
+    Rating,
+    Payment,
+    Cashback,
+    SpendingLedger,
+)
+SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)")
+POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def explain(sql, params):
+    """План запроса одной строкой."""
+    prefix = "EXPLAIN "
+    if connection.vendor == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    return " | ".join(str(row[-1]) for row in rows)
+
+
+def scanned_tables(plan):
+    """Таблицы, которые план читает полным сканированием."""
+    if connection.vendor == "sqlite":
+        return SQLITE_SCAN.findall(plan)
+    return POSTGRES_SCAN.findall(plan)
+
+
+def full_scans(queries):
+    """Полные сканирования больших таблиц в запросах record_queries.
+
+    Возвращает список троек (таблицы, запрос, план) для SELECT,
+    которые читают большие таблицы целиком.
+    """
+    large_tables = {model._meta.db_table for model in LARGE_MODELS}
+    found = []
+    for sql, params in queries:
+        if not sql.lstrip().upper().startswith("SELECT"):
+            continue
+        plan = explain(sql, params)
+        scanned = large_tables.intersection(scanned_tables(plan))
+        if scanned:
+            found.append((sorted(scanned), sql, plan))
+    return found
@@ -0,0 +1,177 @@
+"""Наполнение базы данных синтетическими данными для замеров.
+
+Данные собираются фабриками factory-boy и записываются пачками через
+bulk_create, после чего денормализованные счетчики пересчитываются
+так же, как это делают команды обслуживания.
+"""
+import datetime
+import random
+
+import factory
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.utils import timezone
+
+from payments.models import Cashback, Payment, TariffKind
+from payments.tasks import calculate_cashback, rebuild_spending_ledgers
+from .models import Category, Rating, Service, Subscription
+from .tasks import backfill_service_ratings
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+SEED_IMAGE = "services/images/Icon_tg.png"
+SEED_CATEGORY_IMAGE = "categories/images/Box.jpg"
+
+
+class UserFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = User
+
+    username = factory.Sequence(lambda number: f"seed_user_{number}")
+    email = factory.Sequence(lambda number: f"seed_user_{number}@pay2u.ru")
+    phone_number = factory.Sequence(lambda number: f"+7{number:010d}")
+    first_name = factory.Faker("first_name", locale="ru_RU")
+    last_name = factory.Faker("last_name", locale="ru_RU")
+    surname = factory.Faker("middle_name", locale="ru_RU")
+    password = "!"
+
+
+class CategoryFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Category
+
+    title = factory.Sequence(lambda number: f"Категория {number}")
+    image = SEED_CATEGORY_IMAGE
+
+
+class ServiceFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Service
+
+    name = factory.Sequence(lambda number: f"Сервис {number}")
+    image = SEED_IMAGE
+    text = factory.Faker("sentence", locale="ru_RU")
+    cost = factory.Faker("random_int", min=99, max=999)
+    cashback_percentage = factory.Faker("random_int", min=1, max=30)
+    partners_link = factory.Faker("url")
+
+
+def _bulk_create(model, objects):
+    """bulk_create, возвращающий объекты с первичными ключами.
+
+    SQLite в Django 3.2 не возвращает ключи вставленных строк,
+    поэтому они перечитываются в порядке вставки.
+    """
+    created = model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    if created and created[0].pk is None:
+        created = list(model.objects.order_by("-pk")[: len(created)])
+        created.reverse()
+    return created
+
+
+def seed_dataset(
+    users=100,
+    services=20,
+    categories=5,
+    subscriptions=3,
+    payments=4,
+    ratings=2,
+    cashbacks=0.5,
+    seed=None,
+):
+    """Создает пользователей, сервисы, подписки, платежи и оценки.
+
+    subscriptions, payments и ratings задаются на одного пользователя
+    (платежи - на одну подписку), cashbacks - доля платежей с уже
+    начисленным кешбэком. Возвращает словарь с количеством
+    созданных записей по моделям.
+    """
+    rng = random.Random(seed)
+    UserFactory.reset_sequence(
+        (User.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+    )
+    subscriptions = min(subscriptions, services)
+    ratings = min(ratings, services)
+    category_objects = _bulk_create(
+        Category, CategoryFactory.build_batch(categories)
+    )
+    service_objects = ServiceFactory.build_batch(services)
+    for service in service_objects:
+        service.category = rng.choice(category_objects)
+    service_objects = _bulk_create(Service, service_objects)
+    tariffs = {}
+    for service in service_objects:
+        tariff = TariffKind(service=service, duration=rng.choice((1, 3)))
+        tariff.save()
+        tariffs[service.pk] = tariff
+    user_objects = _bulk_create(User, UserFactory.build_batch(users))
+
+    today = timezone.localdate()
+    next_payment_date = None
+    if payments:
+        next_payment_date = today + datetime.timedelta(days=30 * payments)
+    subscription_objects = []
+    rating_objects = []
+    for user in user_objects:
+        for service in rng.sample(service_objects, subscriptions):
+            subscription_objects.append(
+                Subscription(
+                    user=user,
+                    service=service,
+                    activation_status=rng.choice((1, 2, 3)),
+                    autopayment=rng.random() < 0.5,
+                    next_payment_date=next_payment_date,
+                )
+            )
+        for service in rng.sample(service_objects, ratings):
+            rating_objects.append(
+                Rating(user=user, service=service, stars=rng.randint(1, 5))
+            )
+    subscription_objects = _bulk_create(Subscription, subscription_objects)
+    _bulk_create(Rating, rating_objects)
+
+    payment_objects = []
+    for subscription in subscription_objects:
+        tariff = tariffs[subscription.service_id]
+        for number in range(payments):
+            payment_objects.append(
+                Payment(
+                    user_id=subscription.user_id,
+                    service_id=subscription.service_id,
+                    subscription=subscription,
+                    tariff_kind=tariff,
+                    total=tariff.cost_total,
+                    accept_rules=True,
+                    callback="accepted",
+                    next_payment_date=today
+                    + datetime.timedelta(days=30 * (number + 1)),
+                    next_payment_amount=tariff.cost_total,
+                )
+            )
+    payment_objects = _bulk_create(Payment, payment_objects)
+    services_by_id = {service.pk: service for service in service_objects}
+    cashback_objects = [
+        Cashback(
+            payment=payment,
+            amount=calculate_cashback(
+                payment.total,
+                services_by_id[payment.service_id].cashback_percentage,
+            ),
+        )
+        for payment in payment_objects
+        if rng.random() < cashbacks
+    ]
+    _bulk_create(Cashback, cashback_objects)
+
+    backfill_service_ratings()
+    rebuild_spending_ledgers()
+    return {
+        "categories": len(category_objects),
+        "services": len(service_objects),
+        "users": len(user_objects),
+        "subscriptions": len(subscription_objects),
+        "ratings": len(rating_objects),
+        "payments": len(payment_objects),
+        "cashbacks": len(cashback_objects),
+    }
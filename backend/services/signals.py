@@ -0,0 +1,90 @@
+"""Обработчики сигналов моделей приложения services."""
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import (bump_version, finish_request_versions,
+                    start_request_versions)
+from .images import missing_renditions, schedule_renditions
+from .models import Category, Rating, Service, Subscription
+
+
+def _shift_rating(service_id, stars, count):
+    """Атомарно сдвигает счетчики оценок сервиса."""
+    Service.objects.filter(pk=service_id).update(
+        rating_sum=F("rating_sum") + stars,
+        rating_count=F("rating_count") + count,
+    )
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, **kwargs):
+    """Запоминает прежнюю оценку перед ее изменением.
+
+    Строка читается с блокировкой: параллельное изменение той же
+    оценки дождется конца транзакции и прочитает уже новое значение.
+    """
+    instance._previous_rating = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_rating = (
+            Rating.objects.select_for_update()
+            .filter(pk=instance.pk)
+            .values_list("service_id", "stars")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_counters(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_rating", None)
+    if previous is not None:
+        previous_service_id, previous_stars = previous
+        if previous_service_id == instance.service_id:
+            if previous_stars != instance.stars:
+                _shift_rating(
+                    instance.service_id, instance.stars - previous_stars, 0
+                )
+            return
+        _shift_rating(previous_service_id, -previous_stars, -1)
+    _shift_rating(instance.service_id, instance.stars, 1)
+
+
+@receiver(post_delete, sender=Rating)
+def delete_rating_counters(sender, instance, **kwargs):
+    _shift_rating(instance.service_id, -instance.stars, -1)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_cache(sender, **kwargs):
+    # до фиксации транзакции читатель, не нашедший данных в кэше,
+    # сохранил бы под новой версией еще прежние строки
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Category)
+def create_image_renditions(sender, instance, **kwargs):
+    # новое изображение получает в хранилище новое имя, и копий у него
+    # нет: задача ставится только для изображений без копий
+    image = instance.image
+    if image and missing_renditions(image.name, image.storage):
+        schedule_renditions(image.name, sender)
+
+
+@receiver(request_started)
+def remember_versions(sender, **kwargs):
+    start_request_versions()
+
+
+@receiver(request_finished)
+def forget_versions(sender, **kwargs):
+    finish_request_versions()
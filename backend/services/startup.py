@@ -0,0 +1,77 @@
+"""Замер холодного старта воркера в свежем процессе."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Бюджеты по умолчанию в миллисекундах, с запасом на медленные машины CI.
+MAX_IMPORT_MS = 2000
+MAX_FIRST_REQUEST_MS = 1000
+# Модули, которые загружаются только при первом обращении к ним,
+# а не при импорте pay2u.wsgi и первом запросе к API.
+LAZY_MODULES = ("drf_spectacular.views", "push_notifications.apns")
+# Замер в свежем процессе: импорт pay2u.wsgi и первый запрос к нему.
+PROBE = """
+import json
+import sys
+import time
+
+started = time.perf_counter()
+import pay2u.wsgi
+imported = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+
+environ = {"PATH_INFO": sys.argv[1]}
+setup_testing_defaults(environ)
+statuses = []
+response = pay2u.wsgi.application(
+    environ, lambda status, headers, exc_info=None: statuses.append(status)
+)
+b"".join(response)
+response.close()
+finished = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (finished - imported) * 1000,
+    "status": int(statuses[0].split()[0]),
+    "modules": len(sys.modules),
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+class ProbeError(Exception):
+    """Процесс замера завершился с ошибкой."""
+
+
+def run_probe(database, path, *flags):
+    """Запускает замер на базе SQLite database, возвращает процесс."""
+    env = dict(os.environ, SQLITE_PATH=database)
+    return subprocess.run(
+        [sys.executable, *flags, "-c", PROBE, path, *LAZY_MODULES],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def probe(database, path):
+    """Один замер холодного старта.
+
+    Возвращает словарь с временем импорта, первого запроса и всего
+    процесса в миллисекундах, статусом ответа, числом загруженных
+    модулей и списком загруженных модулей из LAZY_MODULES.
+    """
+    started = time.perf_counter()
+    process = run_probe(database, path)
+    elapsed = (time.perf_counter() - started) * 1000
+    if process.returncode:
+        raise ProbeError(process.stderr)
+    run = json.loads(process.stdout.splitlines()[-1])
+    run["process_ms"] = elapsed
+    return run
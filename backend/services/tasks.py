@@ -0,0 +1,70 @@
+"""Фоновые пересчеты данных сервисов."""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Rating, Service, Subscription
+
+NEW_SERVICE_DAYS = 60
+POPULAR_SUBSCRIPTIONS_COUNT = 50
+
+
+def refresh_service_flags(now=None):
+    """Пересчитывает флаги new и popular у сервисов.
+
+    Сервис перестает быть новым через NEW_SERVICE_DAYS дней после
+    публикации и становится популярным, набрав POPULAR_SUBSCRIPTIONS_COUNT
+    подписок. Флаги обновляются массово, чтобы запросы на чтение
+    не писали в таблицу сервисов.
+    Возвращает количество сервисов, утративших признак новизны,
+    и количество сервисов, ставших популярными.
+    """
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(days=NEW_SERVICE_DAYS)
+    popular_ids = (
+        Subscription.objects.values("service")
+        .annotate(subscriptions_count=Count("id"))
+        .filter(subscriptions_count__gte=POPULAR_SUBSCRIPTIONS_COUNT)
+        .values("service")
+    )
+    with transaction.atomic():
+        aged = Service.objects.filter(
+            new=True, pub_date__lte=cutoff
+        ).update(new=False)
+        popular = Service.objects.filter(
+            popular=False, pk__in=popular_ids
+        ).update(popular=True)
+    if aged or popular:
+        bump_version(Service)
+    return aged, popular
+
+
+def backfill_service_ratings():
+    """Пересчитывает счетчики оценок всех сервисов по таблице Rating.
+
+    Обновление выполняется одним запросом с подзапросами, поэтому
+    подходит и для первичного заполнения, и для сверки счетчиков.
+    Возвращает количество обновленных сервисов.
+    """
+    ratings = (
+        Rating.objects.filter(service=OuterRef("pk"))
+        .order_by()
+        .values("service")
+    )
+    updated = Service.objects.update(
+        rating_sum=Coalesce(
+            Subquery(ratings.annotate(total=Sum("stars")).values("total")),
+            0,
+        ),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(total=Count("id")).values("total")),
+            0,
+        ),
+    )
+    bump_version(Service)
+    bump_version(Rating)
+    return updated
@@ -0,0 +1,26 @@
+from django.core.cache import caches
+
+from services.cache import (bump_version, finish_request_versions,
+                            get_version_values, start_request_versions)
+from services.db.routing import ReplicaRouter, read_from
+from services.models import Service
+
+
+def test_shared_cache_read_from_primary():
+    router = ReplicaRouter()
+    with read_from("replica_1"):
+        assert router.db_for_read(caches["shared"].cache_model_class) is None
+        assert router.db_for_read(Service) == "replica_1"
+
+
+def test_bump_version_updates_request_versions(settings):
+    settings.CACHE_VERSION_ALIAS = "default"
+    start_request_versions()
+    try:
+        before = get_version_values(Service)
+        bump_version(Service)
+        after = get_version_values(Service)
+    finally:
+        finish_request_versions()
+    assert after != before
+    assert get_version_values(Service) == after
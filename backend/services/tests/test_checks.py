@@ -0,0 +1,13 @@
+from services.checks import check_sentry_dsn
+
+
+def test_sentry_dsn_required_in_production(settings):
+    settings.DEBUG = False
+    settings.SENTRY_DSN = ""
+    assert [error.id for error in check_sentry_dsn(None)] == ["services.E001"]
+
+
+def test_sentry_dsn_optional_in_debug(settings):
+    settings.DEBUG = True
+    settings.SENTRY_DSN = ""
+    assert check_sentry_dsn(None) == []
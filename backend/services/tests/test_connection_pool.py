@@ -0,0 +1,115 @@
+import copy
+
+import pytest
+from django.db import connections
+
+from services.db import PoolTimeout, drain_pools
+from services.db.sqlite3.base import DatabaseWrapper
+
+ALIAS = "pool_test"
+
+
+@pytest.fixture
+def pooled(db, tmp_path):
+    """Создает обертки SQLite с общим пулом соединений."""
+    wrappers = []
+
+    def pooled(**pool):
+        settings_dict = copy.deepcopy(connections["default"].settings_dict)
+        settings_dict["NAME"] = str(tmp_path / "pool.sqlite3")
+        settings_dict["POOL"] = {
+            "SIZE": 2,
+            "TIMEOUT": 0.05,
+            "IDLE_TIMEOUT": 300,
+            "HEALTH_CHECK_INTERVAL": 300,
+            **pool,
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias=ALIAS)
+        wrappers.append(wrapper)
+        return wrapper
+
+    yield pooled
+    for wrapper in wrappers:
+        wrapper.in_atomic_block = False
+        wrapper.close()
+    if wrappers:
+        drain_pools(ALIAS, wrappers[0]._close_pooled)
+
+
+def stats(wrapper):
+    return wrapper._pool.snapshot()
+
+
+def test_released_connection_reused(pooled):
+    first, second = pooled(), pooled()
+    first.connect()
+    raw = first.connection
+    first.close()
+
+    second.connect()
+    assert second.connection is raw
+    assert second.pool_reused
+    assert stats(second)["opened"] == 1
+    assert stats(second)["reused"] == 1
+
+
+def test_busy_pool_opens_new_connection(pooled):
+    first, second = pooled(), pooled()
+    first.connect()
+    second.connect()
+    assert second.connection is not first.connection
+    assert not second.pool_reused
+    assert stats(second)["open"] == 2
+
+
+def test_full_pool_times_out(pooled):
+    first, second = pooled(SIZE=1), pooled(SIZE=1)
+    first.connect()
+    with pytest.raises(PoolTimeout):
+        second.connect()
+    assert stats(first)["timeouts"] == 1
+
+
+@pytest.mark.parametrize("flag", ["in_atomic_block", "errors_occurred"])
+def test_broken_connection_discarded(pooled, flag):
+    first, second = pooled(), pooled()
+    first.connect()
+    raw = first.connection
+    setattr(first, flag, True)
+    # close() в атомарном блоке соединение не закрывает
+    first._close()
+    first.connection = None
+
+    second.connect()
+    assert second.connection is not raw
+    assert not second.pool_reused
+    assert stats(second)["discarded"] == 1
+    assert stats(second)["open"] == 1
+
+
+def test_dead_connection_replaced(pooled):
+    options = {"HEALTH_CHECK_INTERVAL": 0}
+    first, second = pooled(**options), pooled(**options)
+    first.connect()
+    raw = first.connection
+    first.close()
+    raw.close()
+
+    second.connect()
+    assert second.connection is not raw
+    assert not second.pool_reused
+    assert stats(second)["reconnects"] == 1
+    with second.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def test_idle_connection_expires(pooled):
+    first, second = pooled(IDLE_TIMEOUT=0), pooled(IDLE_TIMEOUT=0)
+    first.connect()
+    raw = first.connection
+    first.close()
+
+    second.connect()
+    assert second.connection is not raw
+    assert stats(second)["expired"] == 1
+    assert stats(second)["open"] == 1
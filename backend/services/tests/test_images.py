@@ -0,0 +1,55 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from django.conf import settings as project_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.v1.serializers import ServiceShortSerializer
+from jobs.models import Job
+from services.images import (generate_renditions, get_base64_payload,
+                             missing_renditions)
+from services.models import Service
+from services.seed import SEED_CATEGORY_IMAGE, SEED_IMAGE, seed_dataset
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    """Хранилище во временном каталоге с изображениями тестовых данных."""
+    for name in (SEED_IMAGE, SEED_CATEGORY_IMAGE):
+        target = tmp_path / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(Path(project_settings.MEDIA_ROOT) / name, target)
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.JOB_QUEUE_EAGER = False
+
+
+def test_renditions_scheduled_only_when_missing(db, media):
+    seed_dataset(users=1, services=1, payments=0, seed=0)
+    service = Service.objects.get()
+    assert missing_renditions(service.image.name)
+    Job.objects.all().delete()
+
+    service.save()
+    assert Job.objects.filter(name="services.generate_renditions").exists()
+
+    Job.objects.all().delete()
+    generate_renditions(service.image.name)
+    service.save()
+    assert not Job.objects.exists()
+
+
+def test_base64_uses_rendition(db, media):
+    seed_dataset(users=1, services=1, payments=0, seed=0)
+    image = Service.objects.get().image
+    generate_renditions(image.name)
+    request = Request(
+        APIRequestFactory().get("/", {"image_format": "base64"})
+    )
+    payload = ServiceShortSerializer(
+        Service.objects.get(), context={"request": request}
+    ).data["image"]
+
+    assert payload == get_base64_payload(image, "small")
+    assert payload != get_base64_payload(image)
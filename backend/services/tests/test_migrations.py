@@ -0,0 +1,46 @@
+from services.models import Rating, Service
+
+BEFORE_COUNTERS = ("services", "0002_initial")
+COUNTERS = ("services", "0003_service_rating_counters")
+
+
+def test_rating_counters_are_filled_for_existing_ratings(migrate):
+    apps = migrate(BEFORE_COUNTERS)
+    User = apps.get_model("users", "CustomUser")
+    Category = apps.get_model("services", "Category")
+    category = Category.objects.create(title="Кино")
+    services = [
+        apps.get_model("services", "Service").objects.create(
+            name=name,
+            category=category,
+            text="-",
+            cost=100,
+            cashback_percentage=5,
+            partners_link="https://example.com",
+        )
+        for name in ("С оценками", "Без оценок")
+    ]
+    for number, stars in enumerate((5, 2)):
+        user = User.objects.create(
+            username=f"user{number}",
+            email=f"user{number}@pay2u.ru",
+            phone_number=f"+7900000000{number}",
+        )
+        apps.get_model("services", "Rating").objects.create(
+            user=user, service=services[0], stars=stars
+        )
+
+    apps = migrate(COUNTERS)
+    counters = dict(
+        (name, (rating_sum, rating_count))
+        for name, rating_sum, rating_count in apps.get_model(
+            "services", "Service"
+        ).objects.values_list("name", "rating_sum", "rating_count")
+    )
+    assert counters == {"С оценками": (7, 2), "Без оценок": (0, 0)}
+
+    # удаление оценки, поставленной до миграции, не уводит счетчик в минус
+    migrate()
+    Rating.objects.filter(stars=5).delete()
+    service = Service.objects.get(pk=services[0].pk)
+    assert (service.rating_sum, service.rating_count) == (2, 1)
@@ -0,0 +1,47 @@
+from unittest import mock
+
+import pytest
+
+from services import promocodes
+from services.models import PromoCode, Subscription
+from services.promocodes import (CLAIM_WINDOW, PromoCodeContention,
+                                 PromoCodePoolEmpty, allocate_promo_code,
+                                 refill_promo_codes)
+from services.seed import seed_dataset
+
+
+@pytest.fixture
+def subscriptions(db):
+    seed_dataset(users=5, services=4, subscriptions=4, seed=0)
+    return list(Subscription.objects.all())
+
+
+def test_codes_are_unique(subscriptions):
+    refill_promo_codes(len(subscriptions))
+    codes = {
+        allocate_promo_code(subscription) for subscription in subscriptions
+    }
+    assert len(codes) == len(subscriptions)
+    assert not promocodes.free_promo_codes().exists()
+
+
+def test_window_starts_anywhere_in_pool(subscriptions):
+    refill_promo_codes(CLAIM_WINDOW * 4)
+    pks = list(PromoCode.objects.order_by("pk").values_list("pk", flat=True))
+    with mock.patch("random.randint", return_value=pks[-10]):
+        window = promocodes._claim_window()
+    # окно с конца пула продолжается с его начала
+    assert [pk for pk, _ in window] == pks[-10:] + pks[:CLAIM_WINDOW - 10]
+
+
+def test_contention_is_not_empty_pool(subscriptions):
+    refill_promo_codes(CLAIM_WINDOW)
+    with mock.patch.object(promocodes, "_claim", return_value=""):
+        with pytest.raises(PromoCodeContention):
+            allocate_promo_code(subscriptions[0])
+
+
+def test_empty_pool(subscriptions):
+    with mock.patch.object(promocodes, "refill_promo_codes"):
+        with pytest.raises(PromoCodePoolEmpty):
+            allocate_promo_code(subscriptions[0])
@@ -0,0 +1,47 @@
+import datetime
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from payments.bank import SimulatedBank
+from payments.models import Payment
+from payments.tasks import renew_autopayments
+from services.diagnostics import (api_client, clear_caches, read_endpoints,
+                                  record_queries)
+from services.query_plans import full_scans
+from services.seed import seed_dataset
+
+
+@pytest.fixture
+def dataset(db):
+    # по статистике ANALYZE планировщик решает, выгоден ли индекс
+    seed_dataset(users=300, services=30, seed=0)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def test_endpoints_use_indexes(dataset):
+    user, endpoints = read_endpoints()
+    client = api_client(user)
+    scans = {}
+    for name, url in endpoints:
+        clear_caches()
+        with record_queries() as queries:
+            response = client.get(url)
+        assert response.status_code == 200, name
+        scans[name] = full_scans(queries)
+    assert scans == {name: [] for name, _ in endpoints}
+
+
+def test_renewals_use_indexes(dataset):
+    today = timezone.localdate() + datetime.timedelta(days=365)
+    with record_queries() as queries:
+        renew_autopayments(today=today, bank=SimulatedBank())
+    assert full_scans(queries) == []
+
+
+def test_full_scan_is_reported(dataset):
+    with record_queries() as queries:
+        list(Payment.objects.filter(total__gt=0))
+    assert full_scans(queries)
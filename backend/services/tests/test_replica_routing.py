@@ -0,0 +1,128 @@
+import collections
+import contextlib
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from services.db.routing import STICKY_CACHE_KEY, sticky_cache
+from services.diagnostics import api_client, clear_caches, read_endpoints
+from services.models import Service
+from services.seed import seed_dataset
+
+REPLICAS = ["replica_1", "replica_2"]
+# Запросов чтения для проверки распределения по репликам.
+SPREAD_REQUESTS = 40
+
+
+@pytest.fixture
+def replicas(transactional_db, settings):
+    """Реплики - отдельные соединения с тем же файлом тестовой базы.
+
+    Данные наполняются с фиксацией транзакций, иначе соединения
+    реплик их бы не увидели.
+    """
+    for alias in REPLICAS:
+        connections.databases[alias] = dict(
+            connections.databases[DEFAULT_DB_ALIAS]
+        )
+    settings.DATABASE_REPLICAS = REPLICAS
+    settings.ASYNC_VIEWS = False
+    # запросы к общему кэшу в базе не относятся к проверяемым чтениям
+    settings.CACHE_VERSION_ALIAS = "default"
+    settings.DB_REPLICA_CACHE_ALIAS = "default"
+    seed_dataset(users=20, services=10, seed=0)
+    clear_caches()
+    yield REPLICAS
+    for alias in REPLICAS:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+
+@contextlib.contextmanager
+def queries_by_alias():
+    """Считает выполненные запросы по псевдонимам баз."""
+    counts = collections.Counter()
+    with contextlib.ExitStack() as stack:
+        for alias in connections:
+
+            def wrapper(execute, sql, params, many, context, alias=alias):
+                counts[alias] += 1
+                return execute(sql, params, many, context)
+
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield counts
+
+
+def request(client, method, url, clear=True, **kwargs):
+    # отметка после записи тоже хранится в кэше
+    if clear:
+        clear_caches()
+    with queries_by_alias() as counts:
+        getattr(client, method)(url, **kwargs)
+    return counts
+
+
+def on_replicas(counts):
+    return not counts[DEFAULT_DB_ALIAS] and sum(counts.values()) > 0
+
+
+def on_primary(counts):
+    return counts[DEFAULT_DB_ALIAS] > 0 and not any(
+        counts[alias] for alias in REPLICAS
+    )
+
+
+def test_reads_go_to_replicas(replicas):
+    user, endpoints = read_endpoints()
+    client = api_client(user)
+    assert [
+        name for name, url in endpoints
+        if not on_replicas(request(client, "get", url))
+    ] == []
+
+
+def test_token_checked_on_primary(replicas):
+    user = get_user_model().objects.first()
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    counts = request(client, "get", "/api/v1/services/")
+    # токен проверяется в основной базе, данные читаются из реплики
+    assert counts[DEFAULT_DB_ALIAS] == 1
+    assert sum(counts.values()) > 1
+
+
+def test_writer_reads_primary_until_window_ends(replicas):
+    user, _ = read_endpoints()
+    other = type(user).objects.exclude(pk=user.pk).first()
+    client = api_client(user)
+    service = Service.objects.exclude(subscriptions__user=user).first()
+
+    counts = request(
+        client, "post", "/api/v1/subscribe/", data={"service_id": service.pk}
+    )
+    assert on_primary(counts)
+    counts = request(client, "get", "/api/v1/services/", clear=False)
+    assert on_primary(counts)
+    counts = request(
+        api_client(other), "get", "/api/v1/services/", clear=False
+    )
+    assert on_replicas(counts)
+
+    # окончание окна после записи
+    sticky_cache().delete(STICKY_CACHE_KEY.format(user=user.pk))
+    counts = request(client, "get", "/api/v1/services/", clear=False)
+    assert on_replicas(counts)
+
+
+def test_reads_spread_over_replicas(replicas):
+    user, _ = read_endpoints()
+    client = api_client(user)
+    spread = collections.Counter()
+    for _ in range(SPREAD_REQUESTS):
+        spread.update(request(client, "get", "/api/v1/catalog/"))
+    assert all(spread[alias] for alias in REPLICAS)
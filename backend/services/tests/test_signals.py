@@ -0,0 +1,57 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models.signals import pre_save
+
+from services.cache import get_version_values
+from services.models import Rating, Service
+from services.seed import seed_dataset
+
+User = get_user_model()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rating_update_shifts_counters_inside_transaction():
+    seed_dataset(users=1, services=1, ratings=1, payments=0, seed=0)
+    rating = Rating.objects.get()
+    atomic = []
+
+    def record(sender, instance, **kwargs):
+        atomic.append(connection.in_atomic_block)
+
+    pre_save.connect(record, sender=Rating)
+    try:
+        rating.stars = 6 - rating.stars
+        rating.save()
+    finally:
+        pre_save.disconnect(record, sender=Rating)
+
+    # прежняя оценка читается с блокировкой в транзакции записи
+    assert atomic == [True]
+    service = Service.objects.get()
+    assert (service.rating_sum, service.rating_count) == (rating.stars, 1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cache_version_bumped_after_commit():
+    seed_dataset(users=1, services=1, payments=0, seed=0)
+    service = Service.objects.get()
+    before = get_version_values(Service)
+    with transaction.atomic():
+        service.save()
+        assert get_version_values(Service) == before
+    assert get_version_values(Service) != before
+
+
+@pytest.mark.django_db
+def test_full_service_save_keeps_rating_counters():
+    seed_dataset(users=1, services=1, ratings=0, payments=0, seed=0)
+    stale = Service.objects.get()
+    Rating.objects.create(user=User.objects.get(), service=stale, stars=4)
+
+    stale.name = "Переименованный"
+    stale.save()
+
+    service = Service.objects.get()
+    assert service.name == "Переименованный"
+    assert (service.rating_sum, service.rating_count) == (4, 1)
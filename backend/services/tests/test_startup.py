@@ -0,0 +1,22 @@
+import pytest
+from django.db import connection
+
+from services.seed import seed_dataset
+from services.startup import MAX_FIRST_REQUEST_MS, MAX_IMPORT_MS, probe
+
+
+@pytest.fixture
+def database(transactional_db):
+    seed_dataset(users=20, services=10, seed=0)
+    return connection.settings_dict["NAME"]
+
+
+def test_cold_start_within_budget(database):
+    run = probe(database, "/api/v1/catalog/")
+    assert run["status"] == 200
+    assert run["import_ms"] <= MAX_IMPORT_MS
+    assert run["first_request_ms"] <= MAX_FIRST_REQUEST_MS
+
+
+def test_optional_modules_load_lazily(database):
+    assert probe(database, "/api/v1/services/")["loaded"] == []
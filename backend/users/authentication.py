@@ -0,0 +1,96 @@
+"""Аутентификация по токену без обращения к базе на каждом запросе.
+
+TokenAuthentication DRF на каждом запросе читает из базы токен вместе
+с пользователем. CachedTokenAuthentication хранит в кэше
+AUTH_CACHE_ALIAS на AUTH_CACHE_TIMEOUT секунд две записи: какому
+пользователю принадлежит токен и самого пользователя. Записи
+удаляют обработчики сигналов users.signals: запись токена - при его
+удалении, в том числе при выходе, запись пользователя - при любом
+его сохранении, в том числе при деактивации и смене пароля.
+
+Локальный кэш процесса при нескольких воркерах (WEB_CONCURRENCY > 1)
+не используется: сброс записей дошел бы только до одного воркера.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_CACHE_KEY = "auth-token:{digest}"
+USER_CACHE_KEY = "auth-user:{user}"
+
+
+def auth_cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def auth_cache_timeout():
+    """Время жизни записей кэша аутентификации, 0 - кэш не используется."""
+    if settings.WEB_CONCURRENCY > 1 and isinstance(auth_cache(), LocMemCache):
+        return 0
+    return settings.AUTH_CACHE_TIMEOUT
+
+
+def token_cache_key(key):
+    # сам токен в ключи кэша не попадает
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return TOKEN_CACHE_KEY.format(digest=digest)
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user=user_id)
+
+
+def cached_user(user_id):
+    """Пользователь из кэша или None."""
+    if not auth_cache_timeout():
+        return None
+    return auth_cache().get(user_cache_key(user_id))
+
+
+def remember_user(user, token_key=None):
+    """Кладет в кэш пользователя и, если задан, его токен."""
+    timeout = auth_cache_timeout()
+    if not timeout:
+        return
+    entries = {user_cache_key(user.pk): user}
+    if token_key is not None:
+        entries[token_cache_key(token_key)] = user.pk
+    auth_cache().set_many(entries, timeout)
+
+
+def forget_token(key):
+    auth_cache().delete(token_cache_key(key))
+
+
+def forget_user(user_id):
+    auth_cache().delete(user_cache_key(user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с пользователем из кэша.
+
+    Запрос с токеном, который уже встречался в течение
+    AUTH_CACHE_TIMEOUT, обходится без запросов к базе. request.auth
+    в этом случае - несохраненный экземпляр токена с ключом и
+    пользователем, без даты создания.
+    """
+
+    def authenticate_credentials(self, key):
+        user_id = None
+        if auth_cache_timeout():
+            user_id = auth_cache().get(token_cache_key(key))
+        user = cached_user(user_id) if user_id is not None else None
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            remember_user(user, key)
+            return user, token
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return user, self.get_model()(key=key, user=user)
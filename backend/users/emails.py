@@ -0,0 +1,56 @@
+"""Письма djoser, отправляемые через очередь фоновых задач."""
+from django.conf import settings
+from djoser import email
+
+from jobs.queue import enqueue
+
+
+class QueuedEmailMixin:
+    """Собирает письмо в запросе, а отправку ставит в очередь.
+
+    Шаблон рендерится сразу, пока доступны запрос и пользователь,
+    в задачу попадают только готовые тема, текст и адресаты.
+    """
+
+    def send(self, to, *args, **kwargs):
+        self.render()
+        enqueue(
+            "users.send_email",
+            subject=self.subject,
+            body=self.body,
+            html=self.html if self.content_subtype != "html" else None,
+            content_subtype=self.content_subtype,
+            from_email=kwargs.get("from_email", settings.DEFAULT_FROM_EMAIL),
+            to=list(to),
+            cc=list(kwargs.get("cc", [])),
+            bcc=list(kwargs.get("bcc", [])),
+            reply_to=list(kwargs.get("reply_to", [])),
+        )
+
+
+class ActivationEmail(QueuedEmailMixin, email.ActivationEmail):
+    pass
+
+
+class ConfirmationEmail(QueuedEmailMixin, email.ConfirmationEmail):
+    pass
+
+
+class PasswordResetEmail(QueuedEmailMixin, email.PasswordResetEmail):
+    pass
+
+
+class PasswordChangedConfirmationEmail(
+    QueuedEmailMixin, email.PasswordChangedConfirmationEmail
+):
+    pass
+
+
+class UsernameChangedConfirmationEmail(
+    QueuedEmailMixin, email.UsernameChangedConfirmationEmail
+):
+    pass
+
+
+class UsernameResetEmail(QueuedEmailMixin, email.UsernameResetEmail):
+    pass
@@ -0,0 +1,26 @@
+"""Фоновые задачи приложения users."""
+from django.core.mail import EmailMultiAlternatives
+
+from jobs.queue import job
+
+
+@job("users.send_email", max_attempts=5)
+def send_email(
+    subject,
+    body,
+    from_email,
+    to,
+    html=None,
+    content_subtype="plain",
+    cc=(),
+    bcc=(),
+    reply_to=(),
+):
+    """Отправляет подготовленное в запросе письмо."""
+    message = EmailMultiAlternatives(
+        subject, body, from_email, to, cc=cc, bcc=bcc, reply_to=reply_to
+    )
+    message.content_subtype = content_subtype
+    if html:
+        message.attach_alternative(html, "text/html")
+    message.send()
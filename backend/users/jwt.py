@@ -0,0 +1,33 @@
+"""Аутентификация по JWT simplejwt с пользователем из кэша.
+
+Модуль загружается, только если JWT_AUTH_ENABLED добавляет
+CachedJWTAuthentication в классы аутентификации DRF.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import cached_user, remember_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Подпись и срок JWT проверяются без базы, пользователь - из кэша.
+
+    Пользователь кэшируется так же, как у CachedTokenAuthentication,
+    и деактивированный сразу перестает проходить аутентификацию.
+    Выход JWT не отзывает: токен действует до конца своего срока.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = cached_user(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            remember_user(user)
+            return user
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        return user
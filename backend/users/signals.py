@@ -0,0 +1,24 @@
+"""Обработчики сигналов моделей приложения users."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user
+from .models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    # удаление набором, как при выходе в djoser, тоже шлет сигнал
+    # для каждого токена
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_changed_user(sender, instance, **kwargs):
+    # до фиксации транзакции другие запросы прочитали бы из базы
+    # и снова закэшировали прежнего пользователя
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_user(user_id))
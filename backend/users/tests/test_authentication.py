@@ -0,0 +1,122 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from services.diagnostics import clear_caches, read_endpoints, record_queries
+from services.seed import seed_dataset
+from users.jwt import CachedJWTAuthentication
+
+PASSWORD = "check-token-auth"
+ME = "/api/v1/users/me/"
+
+
+@pytest.fixture
+def user(transactional_db):
+    # сброс кэша пользователя откладывается до фиксации транзакции
+    seed_dataset(users=20, services=10, seed=0)
+    clear_caches()
+    user, _ = read_endpoints(include_users=True)
+    user.set_password(PASSWORD)
+    user.save()
+    return user
+
+
+def token_client(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+def repeated_queries(client, url):
+    """Запросы повторного обращения: первое прогревает кэши."""
+    client.get(url)
+    with record_queries() as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def test_cache_saves_queries(user, settings):
+    _, endpoints = read_endpoints(include_users=True)
+    client = token_client(user)
+    counts = {}
+    for timeout in (0, 60):
+        settings.AUTH_CACHE_TIMEOUT = timeout
+        for name, url in endpoints:
+            clear_caches()
+            counts.setdefault(name, []).append(repeated_queries(client, url))
+    assert [
+        name for name, (uncached, cached) in counts.items()
+        if cached >= uncached
+    ] == []
+
+
+def test_repeated_request_without_queries(user):
+    assert repeated_queries(token_client(user), ME) == 0
+
+
+def test_local_cache_unused_with_several_workers(user, settings):
+    settings.WEB_CONCURRENCY = 2
+    assert repeated_queries(token_client(user), ME) > 0
+
+
+def test_user_change_visible_at_once(user):
+    client = token_client(user)
+    client.get(ME)
+    user.email = f"changed-{user.email}"
+    user.save()
+    assert client.get(ME).data["email"] == user.email
+
+
+def test_logout_revokes_token(user):
+    client = APIClient()
+    response = client.post(
+        "/api/v1/token/login/", {"email": user.email, "password": PASSWORD}
+    )
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Token {response.data['auth_token']}"
+    )
+    client.get(ME)
+    client.post("/api/v1/token/logout/")
+    assert client.get(ME).status_code == 401
+
+
+def test_token_deletion_revokes_it(user):
+    client = token_client(user)
+    client.get(ME)
+    Token.objects.filter(user=user).delete()
+    assert client.get(ME).status_code == 401
+
+
+def test_deactivation_applies_at_once(user):
+    client = token_client(user)
+    client.get(ME)
+    user.is_active = False
+    user.save()
+    assert client.get(ME).status_code == 401
+
+
+def jwt_request(user):
+    return APIRequestFactory().get(
+        ME, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+
+
+def test_jwt_user_from_cache(user, django_assert_num_queries):
+    authentication = CachedJWTAuthentication()
+    authentication.authenticate(jwt_request(user))
+    with django_assert_num_queries(0):
+        authenticated, _ = authentication.authenticate(jwt_request(user))
+    assert authenticated.pk == user.pk
+
+
+def test_jwt_deactivation_applies_at_once(user):
+    authentication = CachedJWTAuthentication()
+    authentication.authenticate(jwt_request(user))
+    user.is_active = False
+    user.save()
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate(jwt_request(user))